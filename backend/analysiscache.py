@@ -0,0 +1,83 @@
+import os
+import pickle
+import hashlib
+from database.db_models import get_db_path
+
+#Bump when the layout of the cached results changes so old entries are not read back
+PIPELINE_VERSION = 5
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class AnalysisCache:
+    """On disk cache of analysis results, stored in the analysis_cache folder next to the user database.
+       Entries are keyed by the dxf content hash, the catalogue/category rule version and the tolerances used,
+       so editing the drawing, the databases or the tolerances gives a new key.
+       Least recently used entries are removed once the folder grows past max_bytes"""
+
+    def __init__(self, directory=None, max_bytes=None):
+        if directory is None:
+            directory = os.path.join(os.path.dirname(get_db_path()), 'analysis_cache')
+        if max_bytes is None:
+            max_bytes = int(os.environ.get('MJH_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(file_hash, catalogue_version, tolerances):
+        text = f'{PIPELINE_VERSION}|{file_hash}|{catalogue_version}|{tolerances!r}'
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, f'{key}.pickle')
+
+    def get(self, key):
+        """Returns the cached result or None, a hit marks the entry as recently used"""
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                result = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:  #corrupt or unreadable entry, drop it and analyse again
+            print(f"Warning: Could not read analysis cache entry: {e}")
+            self.remove(path)
+            return None
+        os.utime(path)
+        return result
+
+    def put(self, key, result):
+        path = self.path(key)
+        temp_path = path + '.tmp'
+        try:
+            with open(temp_path, 'wb') as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, path)
+        except Exception as e:
+            print(f"Warning: Could not write analysis cache entry: {e}")
+            self.remove(temp_path)
+            return
+        self.evict()
+
+    def evict(self):
+        """Removes the least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.pickle'):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append([stat.st_mtime_ns, stat.st_size, os.path.join(self.directory, name)])
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self.remove(path)
+            total -= size
+
+    @staticmethod
+    def remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
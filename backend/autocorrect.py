@@ -1,251 +1,267 @@
 import ezdxf
-from ezdxf.lldxf import const
 import subprocess
 import os
+import hashlib
 import numpy as np
 import pandas as pd
 import math
-from sympy import symbols, Matrix, Eq, solve
 from dataclasses import dataclass
 from backend.mathematical import Mathematical
 from backend.guipresentation import presentation
 from backend.datafiltration import datafiltration
-from db_objects import before_after, validate_categories
+from backend.extraction import extract_drawing, stream_drawing, bind_refs, detach_refs, extract_polyline_points
+from backend.analysiscache import AnalysisCache
+from db_objects import before_after, before_correction, validate_categories, catalogue_version
 
 maths = Mathematical()
 pres = presentation() 
 filter = datafiltration()
 
-def autocad_points(filepath): 
+TOLERANCE = 1  #within this distance a block/line is on a line 
+TOLERANCE_2 = 5 #blocks within this distance (and outside TOLERANCE) are moved onto the line 
+DUPLICATE_TOLERANCE = 0 #lines with the same name and ends within this distance of an earlier line are duplicates, 0 only catches exact copies 
+MERGE_COLLINEAR = False #merge collinear overlapping segments with the same name before blocks and lines are checked against them 
+
+def analysis_settings(): 
+    #everything other than the file and the catalogue that changes the results, part of the analysis cache key 
+    return (TOLERANCE, TOLERANCE_2, DUPLICATE_TOLERANCE, MERGE_COLLINEAR)
+
+def autocad_points(filepath, streaming=False): 
     """This function extracts all necessasry data for analysis from the autocad file. 
-       Inputs are filepath (the autocad file itself)
-       Outputs are: Block references points, DiagonalBrace_Points (start and end position of all lines), All Walls (Wall points, points on the channel outline)"""
+       Inputs are filepath (the autocad file itself), streaming (low memory mode, the document is not loaded and doc is None)
+       Output is an AnalysisResult, or None if the file is missing lines, blocks or a channel outline"""
 
-    doc = ezdxf.readfile(filepath)
-    msp = doc.modelspace()
-    
-    block_length = []
-    blocks = []
-    Blockref_Points = []
-    all_lines = []
-    all_walls = []  
-    insert_refs = []
-    line_refs = []
-    block_names = []
-    new_names = []
-    layers = []
-    offsets = []
-    wall_point_refs = [] 
-
-    for insert in msp.query('INSERT'): 
-        blockName = insert.dxf.name
-        x = round(insert.dxf.insert.x, 2)
-        y = round(insert.dxf.insert.y, 2)
-        block_length.append([blockName, x, y]) 
-
-    blocks_fil = maths.blockcheck(block_length)
-
-    for insert in msp.query('INSERT'): 
-        blockName = insert.dxf.name
-        x = round(insert.dxf.insert.x, 2)
-        y = round(insert.dxf.insert.y, 2) 
-        angle = round(insert.dxf.rotation, 2)
-
-        if blockName.startswith('*U'): #Dynamic block
-            block = doc.blocks.get(blockName)
-            blockRecord = block.block_record
-            try:
-                if xdata := blockRecord.get_xdata("AcDbBlockRepBTag"):
-                    for tag in xdata:
-                        if tag.code == 1005: #xdata tag to store reference handle
-                            ogHandle = tag.value
-                            for b in doc.blocks: #Look through all blocks to find original reference block (handle match)
-                                if b.dxf.handle == ogHandle:
-                                    name = b.dxf.name #Use the name of the original block
-                                    block_def = b  # *** NEW: Store block definition for offset calculation ***
-            except const.DXFValueError: #Doesn't have indirect dynamic block tag or xdata not available
-                print("Not a dynamic block")
-                name = blockName
-                block_def = block  # *** NEW: Use current block if not dynamic ***
-
-        else: #Non-dynamic standard block
-            name = blockName
-            block_names.append([blockName, x, y])
-            block_def = doc.blocks.get(blockName)  # *** NEW: Get block definition for standard blocks ***
-
-        offset_found = False 
-        name_error = None 
-
-        bedit_check = len(blocks_fil)
-
-        if bedit_check == 1: 
-            if blockName != blocks_fil[0][0]:
-                continue
-
-            for entity in block_def:
-                if entity.dxftype() == 'INSERT':
-                    x_offset = entity.dxf.insert.x
-                    y_offset = entity.dxf.insert.y
-                    new_name = entity.dxf.name
-                    offsets.append([new_name, x_offset, y_offset, name])
-
-                    if new_name.startswith('*U'):
-                        nested_block = doc.blocks.get(new_name)
-                        nested_record = nested_block.block_record
-                        try:
-                            if xdata := nested_record.get_xdata("AcDbBlockRepBTag"):
-                                for tag in xdata:
-                                    if tag.code == 1005:
-                                        ogHandle = tag.value
-                                        for b in doc.blocks:
-                                            if b.dxf.handle == ogHandle:
-                                                new_name = b.dxf.name
-                        except const.DXFValueError:
-                            pass  
-
-                    new_names.append([new_name])
-                    x_final = round(x + x_offset, 2)
-                    y_final = round(y + y_offset, 2)
-                    if new_name != name:
-                        name_error = True
-                    if new_name == name:
-                        name_error = None
-                    insert_refs.append(entity)  
-                    Blockref_Points.append([new_name, x_final, y_final, angle, name])
-
-
-                elif entity.dxftype() == 'LINE':
-                    line_refs.append(entity)
-                    layer = entity.dxf.layer
-                    start_x = round(x + entity.dxf.start.x, 2)
-                    start_y = round(y + entity.dxf.start.y, 2)
-                    end_x = round(x + entity.dxf.end.x, 2)
-                    end_y = round(y + entity.dxf.end.y, 2)
-                    layers.append([layer])
-                    all_lines.append([layer, start_x, start_y, end_x, end_y, True])
-
-                elif entity.dxftype() == 'LWPOLYLINE':
-                    if entity.dxf.layer == 'CHANNEL OUTLINE':   # add layer filter
-                        wall_point_refs.append(entity)
-                        raw_points = extract_polyline_points(entity)
-                        offset_points = [
-                            [round(x + p[0], 1), round(y + p[1], 1)]
-                            for p in raw_points
-                            if 10 <= x + p[0] <= 300000 and 10 <= y + p[1] <= 300000
-                        ]
-                        if offset_points:   # only append if not empty
-                            all_walls.append(offset_points)
-
-
-        else: 
-            insert_refs.append(insert)
-            for entity in block_def: #Searching for blocks inside the BEDIT
-                if entity.dxftype() == 'INSERT':
-                    x_offset = entity.dxf.insert.x   #find offset inside block 
-                    y_offset = entity.dxf.insert.y
-                    new_name = entity.dxf.name        #find 
-                    new_names.append([new_name])
-                    if x_offset > 0.01 and y_offset > 0.01:
-                        x_final = x + x_offset 
-                        y_final = y + y_offset 
-                        offset_found = True 
-                    if new_name != name: 
-                        name_error = True 
-                    if new_name == name: 
-                        name_error = None 
-         
-            attrib_data = {}  #reset each iteration
-            if insert.has_attrib:
-                for attrib in insert.attribs:
-                    attrib_data[attrib.dxf.tag] = attrib.dxf.text 
-                
-            if offset_found: 
-                Blockref_Points.append([new_name, x_final, y_final, angle, name])
-            else:     
-                Blockref_Points.append([name, x, y, angle, name_error])  
-        
-    if bedit_check != 1: 
-        for line in msp.query('LINE'):
-            line_refs.append(line)
-            layer = line.dxf.layer
-            name = blockName 
-            start_x = round(line.dxf.start.x, 2)
-            start_y = round(line.dxf.start.y, 2)
-            end_x = round(line.dxf.end.x, 2)
-            end_y = round(line.dxf.end.y, 2)
-            layers.append([layer])
-            all_lines.append([layer, start_x, start_y, end_x, end_y, False])    
-
-        print(f'These are all the lines {len(all_lines)}') 
-
-        # Extract POLYLINE data 
-        for polyline in msp.query('LWPOLYLINE[layer=="CHANNEL OUTLINE"]'):
-            points = extract_polyline_points(polyline)
-            wall_point_refs.append(polyline)
-            all_walls.append(points)
-
-
-    if len(all_lines) < 1 or len(all_walls) < 1 or len(Blockref_Points) < 1: 
+    if streaming: 
+        doc = None 
+        model = stream_drawing(filepath)
+    else: 
+        doc = ezdxf.readfile(filepath)
+        model = extract_drawing(doc)
+
+    if len(model.all_lines) < 1 or len(model.all_walls) < 1 or len(model.blockref_points) < 1: 
         return None 
 
-    else: 
-        wall_lengths = maths.wall_len(all_lines)  
-        slopes, y_intercepts, line_properties, wall_slopes, wall_intercepts = maths.slope_values(all_lines, all_walls) 
-        wall_slope_intercept = pres.combine_slope_walls(wall_lengths, slopes, y_intercepts)
-        (blocks_on_line, mistake_points, final_corrected_blocks,
-        final_corrected_block_refs, filtered_walls, 
-        correct_blocks, fixed_all_blocks, bedit_mistake_points,
-        bedit_corrected_blocks) = filter.On_Channel_Line(Blockref_Points, all_walls, insert_refs, line_properties, tolerance=1, tolerance_2=5)
-        on_line_points, all_lines_table = pres.what_line(blocks_on_line, filtered_walls, all_lines, tolerance = 1)
-        (line_mistakes, correct_lines, line_mistake_refs, 
-        correct_line_refs, line_line_connections, line_line_connections_check) = filter.find_line_error(all_lines, all_walls, line_refs, line_properties, wall_slopes, wall_intercepts, tolerance=1)
-        fixed_lines, fixed_lines_box, line_mistake_refs = filter.fix_line_mistakes(line_mistakes, line_mistake_refs)
-
-        (final_fixed_lines, final_correct_lines, 
-         final_fixed_lines_refs, final_correct_line_refs) = filter.filter_offset_lines(fixed_lines, line_mistake_refs, correct_lines, correct_line_refs)
-
-        line_mistake_points = filter.find_fixed_line_points(line_mistakes, fixed_lines_box)
-        duplicate_line_refs, line_duplicate_points = filter.remove_duplicate_lines(all_lines, line_refs)
-
-        filtered_blockref, filtered_walls, filtered_insert_refs  = maths.Shape_outline(Blockref_Points, all_walls, insert_refs)
-
-        (post_accepted_blocks, post_accepted_lines, 
-        post_rejected_block, post_rejected_lines) = before_after(fixed_all_blocks, filtered_blockref, all_lines, correct_lines, fixed_lines, wall_slopes, wall_intercepts, all_walls, line_refs)
-
-        line_block_connections = filter.link_line_connections(correct_lines, fixed_lines, fixed_all_blocks)
-
-        final_line_line_connections = filter.fix_line_channel_return(fixed_lines, line_mistake_refs, wall_slopes, wall_intercepts, all_walls, line_line_connections_check, line_line_connections)
-
-        line_name, all_fail = validate_categories(final_line_line_connections, line_block_connections)
-        finals_corrected_blocks = maths.return_error(final_corrected_blocks, mistake_points)
-
-        return (doc, on_line_points, all_lines_table, 
-            wall_slope_intercept, filtered_walls, mistake_points, 
-            finals_corrected_blocks, line_mistakes, final_fixed_lines, final_corrected_block_refs, 
-            line_mistake_points, final_fixed_lines_refs, duplicate_line_refs, line_duplicate_points,
-            post_accepted_blocks, post_accepted_lines, 
-            post_rejected_block, post_rejected_lines, line_name, all_fail, 
-            blocks_fil, bedit_check, fixed_lines, line_mistake_refs, all_walls, wall_point_refs, bedit_mistake_points, bedit_corrected_blocks)
-
-def extract_polyline_points(polyline): #Convert wall points into x and y points 
-        if polyline.dxftype() == 'LWPOLYLINE':
-            wall_points = []
-            for point in polyline.get_points():
-                x = float(round(point[0], 1))  
-                y = float(round(point[1], 1))  
-                wall_points.append([x, y])
-            return wall_points
-        # return []
-
-def update_dxf_in_place(filepath, output_filepath):
-    """This function updates the dxf file, function updates Block reference and line positions based on corrections
-    Red box is drawn around Block reference mistakes and a Red circle is drawn around line mistakes. """
+    return AnalysisResult(doc, model)
+
+
+class AnalysisResult: 
+    """Everything found in one drawing. The geometry corrections (what the writer needs) are worked out straight away, 
+       the other stages are only worked out the first time one of their values is used and then kept: 
+       presentation: the tables shown in the Results tab 
+       database: Object Database checks of the blocks and lines after correction (before_after) 
+       initial: the same checks on the drawing before correction, only for comparing (before_correction) 
+       linking: which blocks and lines each line starts and ends on 
+       categories: Category Database validation of those connections """
+
+    #value -> stage that works it out 
+    STAGES = {
+        'wall_slope_intercept': 'presentation', 'on_line_points': 'presentation', 'all_lines_table': 'presentation', 
+        'post_accepted_blocks': 'database', 'post_accepted_lines': 'database', 
+        'post_rejected_blocks': 'database', 'post_rejected_lines': 'database', 
+        'initial_accepted_blocks': 'initial', 'initial_rejected_blocks': 'initial', 
+        'initial_accepted_lines': 'initial', 'initial_rejected_lines': 'initial', 
+        'line_block_connections': 'linking', 'final_line_line_connections': 'linking', 
+        'line_name': 'categories', 'all_fail': 'categories', 
+    }
+
+    def __init__(self, doc, model): 
+        self.doc = doc 
+        self.Blockref_Points = model.blockref_points
+        self.insert_refs = model.insert_refs
+        self.all_lines = model.all_lines
+        self.line_refs = model.line_refs
+        self.all_walls = model.all_walls
+        self.wall_point_refs = model.wall_point_refs
+        self.blocks_fil = model.blocks_fil
+        self.bedit_check = model.bedit_check
+        self.geometry()
+
+    on_stage = None #called with the name of each stage once it has been worked out (the AnalysisSession updates the cache)
+
+    def __getattr__(self, name): 
+        #only called for values that are not set yet, runs the stage that sets them 
+        stage = self.STAGES.get(name)
+        if stage is None: 
+            raise AttributeError(name)
+        getattr(self, stage)()
+        if self.on_stage is not None: 
+            self.on_stage(stage)
+        return self.__dict__[name]
+
+    def worked_out(self, *stages): 
+        """True if the values of the stages are already there (worked out before or loaded from the analysis cache)"""
+        return all(name in self.__dict__ for name, stage in self.STAGES.items() if stage in stages)
+
+    def __getstate__(self): 
+        #on_stage belongs to the session, copies and cache entries are made without it 
+        state = dict(self.__dict__)
+        state.pop('on_stage', None)
+        return state
+
+    def geometry(self): 
+        self.slopes, self.y_intercepts, self.line_properties, self.outline = maths.slope_values(self.all_lines, self.all_walls) 
+        if MERGE_COLLINEAR: #fewer checker lines, members keeps which original lines each one covers, walls come after the lines and are left alone 
+            self.line_properties = self.line_properties.merged(keep=range(len(self.all_lines), len(self.line_properties)))
+        (self.blocks_on_line, self.mistake_points, final_corrected_blocks,
+        self.corrected_block_refs, self.filtered_walls, 
+        correct_blocks, self.fixed_all_blocks, self.bedit_mistake_points,
+        self.bedit_corrected_blocks) = filter.On_Channel_Line(self.Blockref_Points, self.all_walls, self.insert_refs, self.line_properties, tolerance=TOLERANCE, tolerance_2=TOLERANCE_2)
+        (self.line_mistakes, self.correct_lines, line_mistake_refs, 
+        correct_line_refs, self.line_line_connections, self.line_line_connections_check) = filter.find_line_error(self.all_lines, self.line_refs, self.line_properties, self.outline, tolerance=TOLERANCE)
+        self.fixed_lines, fixed_lines_box, self.fixed_line_refs = filter.fix_line_mistakes(self.line_mistakes, line_mistake_refs)
+
+        (self.bedit_lines, final_correct_lines, 
+         self.line_bedit_refs, final_correct_line_refs) = filter.filter_offset_lines(self.fixed_lines, self.fixed_line_refs, self.correct_lines, correct_line_refs)
+
+        self.line_mistake_points = filter.find_fixed_line_points(self.line_mistakes, fixed_lines_box)
+        self.duplicate_line_refs, self.line_duplicate_points = filter.remove_duplicate_lines(self.all_lines, self.line_refs, tolerance=DUPLICATE_TOLERANCE)
+        self.corrected_blocks = maths.return_error(final_corrected_blocks, self.mistake_points)
+
+    def presentation(self): 
+        wall_lengths = maths.wall_len(self.all_lines)  
+        self.wall_slope_intercept = pres.combine_slope_walls(wall_lengths, self.slopes, self.y_intercepts)
+        self.on_line_points, self.all_lines_table = pres.what_line(self.blocks_on_line, self.filtered_walls, self.all_lines, tolerance=TOLERANCE)
+
+    def database(self): 
+        (self.post_accepted_blocks, self.post_accepted_lines, 
+        self.post_rejected_blocks, self.post_rejected_lines) = before_after(self.fixed_all_blocks, self.correct_lines, self.fixed_lines, self.outline, self.line_refs)
+
+    def initial(self): 
+        filtered_blockref, _, _ = maths.Shape_outline(self.Blockref_Points, self.all_walls, self.insert_refs)
+        (self.initial_accepted_blocks, self.initial_rejected_blocks, 
+        self.initial_accepted_lines, self.initial_rejected_lines) = before_correction(filtered_blockref, self.all_lines, self.outline, self.line_refs)
+
+    def linking(self): 
+        self.line_block_connections = filter.link_line_connections(self.correct_lines, self.fixed_lines, self.fixed_all_blocks)
+        self.final_line_line_connections = filter.fix_line_channel_return(self.fixed_lines, self.fixed_line_refs, self.outline, self.line_line_connections_check, self.line_line_connections)
+
+    def categories(self): 
+        self.line_name, self.all_fail = validate_categories(self.final_line_line_connections, self.line_block_connections)
+
+
+def file_hash(filepath): 
+    """sha256 of the file contents, read in chunks so large drawings are not held in memory"""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f: 
+        for chunk in iter(lambda: f.read(1024 * 1024), b''): 
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AnalysisSession: 
+    """Keeps the AnalysisResult of an imported file (document and entity references included) so Fix Errors 
+       can hand it straight to the writer instead of analysing the file again. 
+       The file is only analysed again if it has changed on disk since the import (mtime/size first, then the content hash)
+       With a cache the result is saved again each time one of its lazy stages is worked out, so a cache hit has every 
+       stage that has been opened before (catalogue is the catalogue_version the result was worked out with)"""
+
+    def __init__(self, filepath, result, streaming=False, digest=None, cache=None, catalogue=None): 
+        self.filepath = filepath
+        self.streaming = streaming 
+        self.cache = cache 
+        self.catalogue = catalogue 
+        self.written = False #the writer edits the document, once written a fresh copy is loaded for the next write
+        self.attach(result)
+        self.stamp_file(digest)
+
+    def attach(self, result): 
+        self.result = result 
+        self.detached = detach_refs(result) #entity handles, these survive the writer deleting entities
+        result.on_stage = self.stage_done 
+
+    def stage_done(self, stage): 
+        self.detached = detach_refs(self.result)
+        self.store()
+
+    def store(self): 
+        """Saves the result in the analysis cache, skipped if the catalogue has changed since the result was worked out 
+           (the stages would no longer match the key)"""
+        if self.cache is None or catalogue_version() != self.catalogue: 
+            return 
+        self.cache.put(self.cache.key(self.file_hash, self.catalogue, analysis_settings()), self.detached)
+
+    def stamp_file(self, digest=None): 
+        stat = os.stat(self.filepath)
+        self.file_stat = (stat.st_mtime_ns, stat.st_size)
+        self.file_hash = digest or file_hash(self.filepath)
+
+    def is_current(self): 
+        stat = os.stat(self.filepath)
+        if (stat.st_mtime_ns, stat.st_size) == self.file_stat: 
+            return True 
+        return file_hash(self.filepath) == self.file_hash
+
+    def refresh(self): 
+        """Analyses the file again if it has changed since the import"""
+        if self.is_current(): 
+            return 
+        print(f'{self.filepath} has changed on disk, analysing it again')
+        result = autocad_points(self.filepath, self.streaming)
+        if result is None: 
+            raise ValueError('The file is now missing lines, blocks, or a channel outline.')
+        self.written = False 
+        self.catalogue = catalogue_version()
+        self.attach(result)
+        self.stamp_file()
+        self.store()
+
+
+def analyse_file(filepath, streaming=False, cache=True): 
+    """Runs autocad_points on the file and keeps the result in an AnalysisSession, returns None if the file is 
+       missing lines, blocks or a channel outline. 
+       Results are kept in the on disk AnalysisCache, reopening an unchanged file with the same catalogue and tolerances 
+       loads the results without analysing the file (the document is then only loaded by the writer)"""
+    digest = file_hash(filepath)
+    version = catalogue_version()
+    analysis_cache = AnalysisCache() if cache else None 
+
+    if analysis_cache is not None: 
+        cached = analysis_cache.get(analysis_cache.key(digest, version, analysis_settings()))
+        if cached is not None: 
+            return AnalysisSession(filepath, cached, streaming, digest, analysis_cache, version)
+
+    result = autocad_points(filepath, streaming)
+    if result is None: 
+        return None 
+    session = AnalysisSession(filepath, result, streaming, digest, analysis_cache, version)
+    session.store()
+    return session 
 
-    (doc, on_line_points, all_lines_table, 
-        wall_slope_intercept, filtered_walls, mistake_points, 
-        corrected_blocks, line_mistakes, bedit_lines, corrected_block_refs, 
-        line_mistake_points, line_bedit_refs, duplicate_line_refs, duplicate_line_points,
-        _, _, _, _, _, _, blocks_fil, bedit_check, fixed_lines, fixed_line_refs, all_walls, wall_point_refs, _, _) = autocad_points(filepath)
+
+def update_dxf_in_place(session, output_filepath):
+    """This function updates the dxf file, function updates Block reference and line positions based on corrections
+    Red box is drawn around Block reference mistakes and a Red circle is drawn around line mistakes. 
+    The analysis is taken from the AnalysisSession of the import, the document is only read again if it has already been 
+    written once or was never loaded (streaming mode) """
+
+    session.refresh()
+    result = session.result 
+
+    doc = result.doc 
+    corrected_block_refs = result.corrected_block_refs
+    line_bedit_refs = result.line_bedit_refs
+    duplicate_line_refs = result.duplicate_line_refs
+    fixed_line_refs = result.fixed_line_refs
+    wall_point_refs = result.wall_point_refs
+
+    if doc is None or session.written: #entity references are swapped for the ones in the freshly loaded document 
+        doc = ezdxf.readfile(session.filepath)
+        detached = session.detached
+        corrected_block_refs = bind_refs(doc, detached.corrected_block_refs)
+        line_bedit_refs = bind_refs(doc, detached.line_bedit_refs)
+        duplicate_line_refs = bind_refs(doc, detached.duplicate_line_refs)
+        fixed_line_refs = bind_refs(doc, detached.fixed_line_refs)
+        wall_point_refs = bind_refs(doc, detached.wall_point_refs)
+    session.written = True 
+
+    mistake_points = result.mistake_points
+    corrected_blocks = result.corrected_blocks
+    bedit_lines = result.bedit_lines
+    fixed_lines = result.fixed_lines
+    line_mistake_points = result.line_mistake_points
+    duplicate_line_points = result.line_duplicate_points
+    blocks_fil = result.blocks_fil
+    all_walls = result.all_walls
     
     msp = doc.modelspace()
 
@@ -1,5 +1,7 @@
-import math 
+import math
+import numpy as np
 from backend.mathematical import Mathematical
+from backend.geometry import project, equations, move_onto, LineGrid, BoxGrid, PointIndex
 from db_objects import get_catalogue
 
 maths = Mathematical
@@ -16,23 +18,36 @@ class datafiltration:
        find_fixed_line_points: Finds exact points that mistakes occur within lines so they are flagged in corrected dxf """
 
     @staticmethod
-    def remove_duplicate_lines(all_lines, line_refs):
-        seen = []
+    def remove_duplicate_lines(all_lines, line_refs, tolerance=0):
+        """Lines with the same name and the same end points (either way round) as an earlier line are duplicates.
+           With a tolerance the end points only have to be within tolerance of the earlier line's, lines seen are kept in a dict
+           by name and the cell (side tolerance) of each end, so only the lines in the 3x3 cells around a start point are compared"""
+        seen = set()
+        seen_cells = {}
         duplicate_refs = []
         line_duplicates_points = []
         
         for idx, line in enumerate(all_lines):
             name, x_start, y_start, x_end, y_end, offset = line
+            start, end = (x_start, y_start), (x_end, y_end)
+
+            if tolerance <= 0: 
+                # Normalise direction so A->B and B->A are treated as the same line
+                key = (name, tuple(sorted([start, end])))
+                duplicate = key in seen
+                seen.add(key)
+            else: 
+                col, row = math.floor(x_start / tolerance), math.floor(y_start / tolerance)
+                duplicate = any(math.dist(start, seen_start) <= tolerance and math.dist(end, seen_end) <= tolerance 
+                                for i in range(col - 1, col + 2) for j in range(row - 1, row + 2)
+                                for seen_start, seen_end in seen_cells.get((name, i, j), ()))
+                if not duplicate: #stored both ways round so a reversed copy is found from its start point too 
+                    seen_cells.setdefault((name, col, row), []).append((start, end))
+                    seen_cells.setdefault((name, math.floor(x_end / tolerance), math.floor(y_end / tolerance)), []).append((end, start))
             
-            # Normalise direction so A->B and B->A are treated as the same line
-            coords = tuple(sorted([(x_start, y_start), (x_end, y_end)]))
-            key = (name, coords)
-            
-            if key in seen:
+            if duplicate:
                 duplicate_refs.append(line_refs[idx])
                 line_duplicates_points.append([x_start, y_start, x_end, y_end])
-            else:
-                seen.append(key)
 
         return duplicate_refs, line_duplicates_points
     
@@ -53,6 +68,14 @@ class datafiltration:
         correct_block_refs = []
         corrected_block_refs = []
 
+        #Lines whose band (within tolerance_2) passes near each part of the drawing, each block is only checked against the lines near it 
+        if filtered_blockref: 
+            block_x = [block[1] for block in filtered_blockref]
+            block_y = [block[2] for block in filtered_blockref]
+            line_grid = LineGrid(line_properties, min(block_x), min(block_y), max(block_x), max(block_y), max(tolerance, tolerance_2))
+        line_rows = line_properties.rows
+        corners = PointIndex(filtered_walls, 5) #the outline corners, only looked up for blocks that are near a line 
+
         # Use enumerate to get both index and block data
         for idx, block in enumerate(filtered_blockref):
             name = block[0]
@@ -61,54 +84,27 @@ class datafiltration:
             angle = block[3]
             name_error = block[4]
         
-            # Find the closest corner to this block
-            closest_corner = None
-            min_corner_dist = float('inf') #set the value intially to an infinitily large distance 
-            
-            for wall in filtered_walls: #defining the x and y wall points on channel outline 
-                x_wall = wall[0]
-                y_wall = wall[1]
-                distance_corner = math.sqrt((x_wall - x)**2 + (y_wall - y)**2)
-                
-                if distance_corner < min_corner_dist:
-                    min_corner_dist = distance_corner #set the corner distance found to the minimum corner distance 
-                    closest_corner = (x_wall, y_wall)
-
             found_match = False
+            candidates = line_grid.candidates(x, y)
             
             #Situation 1: Check for exact matches (within tolerance)
-            for i in range(len(line_properties)):
-                line_name, slope, intercept, xs, ys, xe, ye = line_properties[i]
-        
-                # Case 1: Vertical line
-                if slope is None:
-                    x_intercept = float(intercept.split()[2]) #Pulling the float value out 
-                    distance = abs(x - x_intercept)
+            for i in candidates:
+                line_name, a, b, c, xs, ys, xe, ye = line_rows[i]
+                distance = abs(a * x + c + b * y) #distance to the line, horizontal for vertical lines (b = 0) and vertical for sloped lines 
                     
-                    if distance <= tolerance: #if the distance is less than the tolerance we've found a match, this logic applies to all cases 
-                        blocks_on_line.append([name, x, y, angle, i, 'vertical', 'On Line', 'Exact'])  #store for interface table presentation 
-                        correct_blocks.append([name, x, y, angle, name_error])   #Store for creating new dxf 
-                        correct_block_refs.append(filtered_insert_refs[idx])  # ← Use filtered refs with idx
-                        found_match = True
-                        break
-                
-                # Case 2: Normal line with slope
-                else:
-                    expected_y = slope * x + intercept
-                    distance = abs(y - expected_y)
-                    
-                    if distance <= tolerance:
-                        blocks_on_line.append([name, x, y, angle, i, 'normal', 'On Line', 'Exact'])
-                        correct_blocks.append([name, x, y, angle, name_error])
-                        correct_block_refs.append(filtered_insert_refs[idx])  # ← Use filtered refs with idx
-                        found_match = True
-                        break
+                if distance <= tolerance: #if the distance is less than the tolerance we've found a match, this logic applies to all cases 
+                    line_type = 'vertical' if b == 0 else 'normal'
+                    blocks_on_line.append([name, x, y, angle, line_properties.members[i][0], line_type, 'On Line', 'Exact'])  #store for interface table presentation 
+                    correct_blocks.append([name, x, y, angle, name_error])   #Store for creating new dxf 
+                    correct_block_refs.append(filtered_insert_refs[idx])  # ← Use filtered refs with idx
+                    found_match = True
+                    break
             
             #Situation 2: Look for near matches 
             if not found_match:
-                for i in range(len(line_properties)):
-                    line_name, slope, intercept, xs, ys, xe, ye = line_properties[i]
-                    
+                for i in candidates:
+                    line_name, a, b, c, xs, ys, xe, ye = line_rows[i]
+
                     #Blocks are being checked against the equation of lines of other lines, an equation of a line assumes a lines length is infinite throuhgh space
                     #the below code stops checking lines that are far from the block being checked to be corrected onto that line 
                     avoid_distant_lines = (xs <= x <= xe or xe <= x <= xs or ys <= y <= ye or ye <= y <= y)
@@ -119,52 +115,29 @@ class datafiltration:
                     if not avoid_distant_lines and (min_distance > 5):  #if the block is not within the range of the line then check if it is within a tolerence, than skip that line
                         continue 
 
-                    # Case 1: Vertical line
-                    if slope is None:
-                        x_intercept = float(intercept.split()[2])
-                        distance = abs(x - x_intercept)
-                        
-                        if distance <= tolerance_2:
-                            blocks_on_line.append([name, x, y, angle, i, 'vertical', 'Near Line', 'Warning'])
-                            
-                            if min_corner_dist <= 5: #If its within 5 of a corner move the block reference to the nearest corner 
-                                mistake_points.append([name, x, y, closest_corner[0], closest_corner[1]])   #Store for interface presnetaion 
-                                corrected_blocks.append([name, closest_corner[0], closest_corner[1], angle, name_error]) #Store for dxf 
-                                corrected_block_refs.append(filtered_insert_refs[idx])  # ← Use filtered refs with idx
-                              
-                            else:
-                                mistake_points.append([name, x, y, x_intercept, y])  #Store for Interface Presentation
-                                corrected_blocks.append([name, x_intercept, y, angle, name_error])   # Store for dxf 
-                                corrected_block_refs.append(filtered_insert_refs[idx])  # ← Use filtered refs with idx
-                           
-                            
-                            found_match = True
-                            break
-                    
-                    # Case 2: Normal line with slope, Holds same logic as above code 
-                    else:
-                        expected_y = slope * x + intercept
-                        distance = abs(y - expected_y)
+                    distance = abs(a * x + c + b * y)
                         
-                        if distance <= tolerance_2:
-                            blocks_on_line.append([name, x, y, angle, i, 'normal', 'Near Line', 'Warning'])
-                            
-                            if min_corner_dist <= 5:
-                                mistake_points.append([name, x, y, closest_corner[0], closest_corner[1]])
-                                corrected_blocks.append([name, closest_corner[0], closest_corner[1], angle, name_error])
-                                corrected_block_refs.append(filtered_insert_refs[idx])  # ← Use filtered refs with idx
-                               
-
-                            else: #We have a Point and  a slope, the below finds the minimum perpendicular distance from the orignal point to that line
-                                #The code returns the x and y points on that line where the intersection occurs, thus becoming the fixed point. 
-                                x_fixed = (x + slope * (y - intercept)) / (slope**2 + 1) 
-                                y_fixed = (slope*x + y*slope**2 + intercept) / (slope**2 + 1)
-                                mistake_points.append([name, x, y, x_fixed, y_fixed])
-                                corrected_blocks.append([name, x_fixed, y_fixed, angle, name_error])
-                                corrected_block_refs.append(filtered_insert_refs[idx])  # ← Use filtered refs with idx
+                    if distance <= tolerance_2:
+                        line_type = 'vertical' if b == 0 else 'normal'
+                        blocks_on_line.append([name, x, y, angle, line_properties.members[i][0], line_type, 'Near Line', 'Warning'])
+
+                        # Find the closest corner to this block 
+                        corner, _ = corners.nearest(x, y, 5)
                         
-                            found_match = True
-                            break
+                        if corner is not None: 
+                            closest_corner = corners.points[corner] #If its within 5 of a corner move the block reference to the nearest corner 
+                            mistake_points.append([name, x, y, closest_corner[0], closest_corner[1]])   #Store for interface presnetaion 
+                            corrected_blocks.append([name, closest_corner[0], closest_corner[1], angle, name_error]) #Store for dxf 
+                            corrected_block_refs.append(filtered_insert_refs[idx])  # ← Use filtered refs with idx
+
+                        else: #The fixed point is the foot of the perpendicular from the block to the line (for vertical lines the block keeps its y)
+                            x_fixed, y_fixed = project((a, b, c), x, y)
+                            mistake_points.append([name, x, y, x_fixed, y_fixed])  #Store for Interface Presentation
+                            corrected_blocks.append([name, x_fixed, y_fixed, angle, name_error])   # Store for dxf 
+                            corrected_block_refs.append(filtered_insert_refs[idx])  # ← Use filtered refs with idx
+                    
+                        found_match = True
+                        break
             
             if not found_match: #No matches found at all within either tolerence return an error
                 blocks_on_line.append([name, x, y, angle, None, None, 'Not On Line', 'Error']) 
@@ -207,12 +180,12 @@ class datafiltration:
         return final_correct_blocks, final_corrected_blocks, final_corrected_refs, final_mistake_blocks
     
     @staticmethod 
-    def find_line_error(all_lines, all_walls, line_refs, line_properties, wall_slopes, wall_intercepts, tolerance=1): 
+    def find_line_error(all_lines, line_refs, line_properties, outline, tolerance=1): 
         """This function goes through all the lines searching for errors. All lines should start and end at another line 
            Unless it is on the channel outline in which case the check just ensures hte line is on the channel outline  
            The code ensures that the end points of each line are on another line, there is a clause to prevent a line from checking itself against its own line
-           If a mistake is identified in a line the closest slope and y intercept are returned (i.e the equation of the line that is closest to that line is returned)
-           If a mistake is identified being too large the point will be returend as a mistake but no intercept or slope will be provided
+           If a mistake is identified in a line the equation (a, b, c) of the line that is closest to each end is returned
+           If a mistake is identified being too large the point will be returend as a mistake but no line equation will be provided
            Thus mistake is flagged, no reasonable fix assumption for code to make"""
 
         line_mistakes = []
@@ -224,13 +197,29 @@ class datafiltration:
         line_mistakes_check = []
         situation_where = []
 
-        print(f'These are the line properties {line_properties}')
-
-        lines_OCO, lines_not_OCO, lines_OCO_refs, lines_not_OCO_refs, _  = maths.Chanel_check_line(wall_slopes, wall_intercepts, all_lines, all_walls, line_refs)
+        lines_OCO, lines_not_OCO, lines_OCO_refs, lines_not_OCO_refs, _  = maths.Chanel_check_line(outline, all_lines, line_refs)
 
         correct_lines.extend(lines_OCO)
         correct_line_refs.extend(lines_OCO_refs)
 
+        #Checker lines are only looked at if the line being checked has an end within tol_2 of them in x and in y (see avoid_distance_lines below)
+        #so the checker lines are indexed by their bounding box grown by tol_2, each line only goes through the checker lines whose box holds 
+        #one of the four combinations of its start/end x and y 
+        tol_2 = 25
+        checker_boxes = BoxGrid(np.minimum(line_properties.x_start, line_properties.x_end) - tol_2, np.minimum(line_properties.y_start, line_properties.y_end) - tol_2, 
+                                np.maximum(line_properties.x_start, line_properties.x_end) + tol_2, np.maximum(line_properties.y_start, line_properties.y_end) + tol_2)
+        checker_rows = line_properties.rows
+
+        #If the checker lines were merged (LineSet.merged) a line is part of its own merged checker line, that checker is swapped 
+        #for the original segments so the line still skips itself below 
+        source_rows = line_properties.source.rows
+        own_group = {}
+        for group, members in enumerate(line_properties.members): 
+            if len(members) > 1: 
+                for m in members: 
+                    line_name, _, _, _, x_s, y_s, x_e, y_e = source_rows[m]
+                    own_group[(line_name, x_s, y_s, x_e, y_e)] = group
+
         for idx, line in enumerate(lines_not_OCO):  #Each start and end ponit of the line are checked against the slope and intercepts of the checker lines 
             name = line[0]                
             x_start = line[1]
@@ -245,24 +234,16 @@ class datafiltration:
             end_line_name = None 
             
             # Track closest lines for start and end points
-            closest_start_slope = None
-            closest_start_intercept = None
+            closest_start = None
             min_start_dist = float('inf')
-            temp_start_slope = None
-            temp_start_intercept = None
+            temp_start = None
             
-            closest_end_slope = None
-            closest_end_intercept = None
+            closest_end = None
             min_end_dist = float('inf')
-            temp_end_slope = None
-            temp_end_intercept = None
+            temp_end = None
 
 
-            min_x = min(x for wall in all_walls for x, y in wall) #finding the boundaries of the shape 
-            min_y = min(y for wall in all_walls for x,y in wall)
-            max_x = max(x for wall in all_walls for x, y in wall)
-            max_y = max(y for wall in all_walls for x, y in wall)
-          
+            min_x, min_y, max_x, max_y = outline.min_x, outline.min_y, outline.max_x, outline.max_y #the boundaries of the shape 
 
             if (x_start < (min_x - 0.2) or x_start > (max_x + 0.2) or y_start < (min_y- 0.2) or y_start > (max_y + 0.2) or
                 x_end < (min_x - 0.2) or x_end > (max_x + 0.2) or y_end < (min_y - 0.2) or y_end > (max_y + 0.2)):
@@ -270,8 +251,16 @@ class datafiltration:
                 end_matches = False 
            
 
-            for prop_line in line_properties: #These are the checker lines all lines (not on the channel outline) are checked 
-                line_name, slope, intercept, x_s, y_s, x_e, y_e = prop_line
+            nearby = checker_boxes.containing_any([(x_start, y_start), (x_start, y_end), (x_end, y_start), (x_end, y_end)])
+            group = own_group.get((name, x_start, y_start, x_end, y_end))
+            checkers = []
+            for i in nearby.tolist(): 
+                if i == group: 
+                    checkers.extend(source_rows[m] for m in line_properties.members[i])
+                else: 
+                    checkers.append(checker_rows[i])
+
+            for line_name, a, b, c, x_s, y_s, x_e, y_e in checkers: #These are the checker lines all lines (not on the channel outline) are checked 
                 
                 same_line_forward = (abs(x_s - x_start) < 0.01 and abs(y_s - y_start) < 0.01 and #avoid checking a line against itself 
                                     abs(x_e - x_end) < 0.01 and abs(y_e - y_end) < 0.01)
@@ -298,7 +287,6 @@ class datafiltration:
                 avoid_same_formula_error_consy_start = avoid_same_formula_error_consy_y and not avoid_same_formula_error_consy_x_start 
                 avoid_same_formula_error_consy_end = avoid_same_formula_error_consy_y and not avoid_same_formula_error_consy_x_end 
             
-                tol_2 = 25
                 #Lines are being checked against the equation of lines of other lines, an equation of a line assumes a lines length is infinite throuhgh space
                 #the below code stops checking lines that are far from the line being checked to be corrected onto that line 
                 avoid_distance_lines_x = ((x_s - tol_2) <= x_start <= (x_e + tol_2) or (x_e - tol_2) <= x_start <= (x_s + tol_2) or 
@@ -324,7 +312,7 @@ class datafiltration:
                 # Check start point and track closest - ONLY STORE TEMP VALUES
                 if not start_matches:
                     if not (avoid_same_formula_error_consx_start or avoid_same_formula_error_consy_start): 
-                        start_dist = maths.find_distance_to_line(x_start, y_start, slope, intercept)
+                        start_dist = abs(a * x_start + c + b * y_start)
                         if start_dist <= tolerance: 
 
                             start_matches = True
@@ -336,15 +324,14 @@ class datafiltration:
                             
                         if start_dist < min_start_dist:
                             min_start_dist = start_dist
-                            temp_start_slope = slope
-                            temp_start_intercept = intercept
+                            temp_start = (a, b, c)
                             temp_start_name_conn = line_name 
 
 
                 # Check end point and track closest
                 if not end_matches:     
                     if not (avoid_same_formula_error_consx_end or avoid_same_formula_error_consy_end): 
-                        end_dist = maths.find_distance_to_line(x_end, y_end, slope, intercept) 
+                        end_dist = abs(a * x_end + c + b * y_end)
                     
                         if end_dist <= tolerance: 
                             end_matches = True
@@ -356,40 +343,35 @@ class datafiltration:
 
                         if end_dist < min_end_dist:
                             min_end_dist = end_dist
-                            temp_end_slope = slope
-                            temp_end_intercept = intercept    
+                            temp_end = (a, b, c)
                             temp_end_name_conn = line_name   
 
                 if start_matches and end_matches: #If a match is found break 
                     break            
 
-            #The below code takes the temp slopes and intercepts found in the above code, slopes and intercepts are split into different 
+            #The below code takes the temp line equations found in the above code, they are split into different 
             if min_start_dist <= 25:
-                closest_start_slope = temp_start_slope
-                closest_start_intercept = temp_start_intercept
+                closest_start = temp_start
                 start_line_name = temp_start_name_conn
             elif 25 < min_start_dist < 35:
-                closest_start_slope = None
-                closest_start_intercept = None
+                closest_start = None
                 start_line_name = None 
             elif min_start_dist > 35: 
                 start_matches = True    
                 start_line_name = None 
 
             if min_end_dist <= 25: 
-                closest_end_slope = temp_end_slope
-                closest_end_intercept = temp_end_intercept
+                closest_end = temp_end
                 end_line_name = temp_end_name_conn
             elif 25 < min_end_dist < 35:
-                closest_end_slope = None    
-                closest_end_intercept = None
+                closest_end = None    
                 end_line_name = None
             elif min_end_dist > 35: 
                 end_matches = True 
                 end_line_name = None
             
             if not start_matches or not end_matches:  
-                line_mistakes.append([name, x_start, y_start, x_end, y_end, closest_start_slope, closest_start_intercept, closest_end_slope, closest_end_intercept])
+                line_mistakes.append([name, x_start, y_start, x_end, y_end, closest_start, closest_end])
                 line_mistakes_check.append([name, x_start, y_start, x_end, y_end, start_line_name, end_line_name])
                 line_mistake_refs.append(lines_not_OCO_refs[idx])
                 line_line_connections_check.append([name, start_line_name, end_line_name, x_start, y_start, x_end, y_end])
@@ -408,84 +390,37 @@ class datafiltration:
     
     @staticmethod
     def fix_line_mistakes(line_mistakes, line_mistake_refs): 
-        """This function fixes any errors recored in the find_line_error function, mathamtically vertical lines are account for in all scenarios 
-           If both lines have slopes, functions are solved using simealtaneous equations 
+        """This function fixes any errors recored in the find_line_error function, each end of a line is moved to where the line crosses the 
+           closest line found for that end. All the crossings are solved at once in closed form, vertical lines are account for in all scenarios 
+           (if both lines are vertical the end is snapped onto the closest line, if the lines are otherwise parallel the end stays where it is)
            The function returns a list of fixed lines with their name, position, layer, and colour. """
         
-
-        # print(f'These are the line mistakes {line_mistakes}')
-        
         fixed_lines = []
         fixed_lines_box = []
+
+        #Basically if line is too far away form anything leave it as it is (it is supposed to be like that)
+        fixable = [line for line in line_mistakes if line[5] is not None and line[6] is not None]
+
+        if fixable: 
+            x_start, y_start, x_end, y_end = np.array([line[1:5] for line in fixable], dtype=float).T
+            a_start, b_start, c_start = np.array([line[5] for line in fixable], dtype=float).T
+            a_end, b_end, c_end = np.array([line[6] for line in fixable], dtype=float).T
+
+            a, b, c = equations(x_start, y_start, x_end, y_end, x_start == x_end) #equation of the line being fixed 
+            new_x_start, new_y_start = move_onto(a, b, c, a_start, b_start, c_start, x_start, y_start)
+            new_x_end, new_y_end = move_onto(a, b, c, a_end, b_end, c_end, x_end, y_end)
+            fixed_points = iter(zip(new_x_start.tolist(), new_y_start.tolist(), new_x_end.tolist(), new_y_end.tolist()))
         
         for line in line_mistakes: 
-            name = line[0]
-            x_start = line[1]
-            y_start = line[2]
-            x_end = line[3]
-            y_end = line[4]
-            closest_start_slope = line[5]
-            closest_start_intercept = line[6]
-            closest_end_slope = line[7]
-            closest_end_intercept = line[8]
+            name, x_start, y_start, x_end, y_end, closest_start, closest_end = line 
         
-            #Basically if line is too far away form anything leave it as it is (it is supposed to be like that)
-            if (closest_start_slope is None and closest_start_intercept is None) or (closest_end_slope is None and closest_end_intercept is None): 
-                new_x_start = x_start 
-                new_y_start = y_start 
-                new_x_end = x_end
-                new_y_end = y_end
-
-                fixed_lines.append([name, new_x_start, new_y_start, new_x_end, new_y_end, False]) #Append these results so they are no longer checked
-                fixed_lines_box.append([name, new_x_start, new_y_start, new_x_end, new_y_end, closest_start_slope, closest_start_intercept, closest_end_slope, closest_end_intercept])
-                continue
-
-            elif x_start == x_end:  # Vertical line
-
-                if closest_start_slope is None: #This is unlikely scenario, if both lines are vertical, probably that line is offset so it gets snapped onto the vertical line closest to it. 
-                    x_intercept_start = float(closest_start_intercept.split()[2])
-                    new_x_start = x_intercept_start 
-                    new_y_start = y_start 
-                else:
-                    new_x_start = x_start  #if line has a slope 
-                    new_y_start = closest_start_slope * x_start + closest_start_intercept #calculate where new y should be based on original line 
-                
-                if closest_end_slope is None: #same as above but for the end 
-                    x_intercept_end = float(closest_end_intercept.split()[2])
-                    new_x_end = x_intercept_end
-                    new_y_end = y_end
-                else:
-                    new_x_end = x_end
-                    new_y_end = closest_end_slope * x_end + closest_end_intercept
-            
-            else: #if slope of original line is not None 
-                slope_line = (y_end - y_start) / (x_end - x_start) #original line has a slope value 
-                intercept_line = y_start - slope_line * x_start  
-
-                # FIX START POINT
-                if closest_start_slope is None:
-                    x_intercept_start = float(closest_start_intercept.split()[2])
-                    new_x_start = x_intercept_start #new start point for the line will be x point on closest line 
-                    new_y_start = slope_line * new_x_start + intercept_line  #plug new start x into formula to find new y point 
-                        
-                else: #both lines have slopes call sim eq func 
-                    new_x_start, new_y_start = maths.solve_simultaneous_equations(closest_start_slope, closest_start_intercept, slope_line, intercept_line)
-                    if new_x_start is None: 
-                        new_x_start, new_y_start = x_start, y_start
-
-                # Fix the end points, same logic as above. 
-                if closest_end_slope is None:
-                    x_intercept_end = float(closest_end_intercept.split()[2]) #move the line to the x point
-                    new_x_end = x_intercept_end #move the line to the x point
-                    new_y_end = slope_line * new_x_end + intercept_line #sub into equation to find new y point 
-                        
-                else: #Both lines have slopes call sim eq func 
-                    new_x_end, new_y_end = maths.solve_simultaneous_equations(closest_end_slope, closest_end_intercept, slope_line, intercept_line)
-                    if new_x_end is None: 
-                        new_x_end, new_y_end = x_end, y_end
+            if closest_start is None or closest_end is None: 
+                new_x_start, new_y_start, new_x_end, new_y_end = x_start, y_start, x_end, y_end #Append these results so they are no longer checked
+            else: 
+                new_x_start, new_y_start, new_x_end, new_y_end = next(fixed_points)
 
             fixed_lines.append([name, new_x_start, new_y_start, new_x_end, new_y_end, False])
-            fixed_lines_box.append([name, new_x_start, new_y_start, new_x_end, new_y_end, closest_start_slope, closest_start_intercept, closest_end_slope, closest_end_intercept])
+            fixed_lines_box.append([name, new_x_start, new_y_start, new_x_end, new_y_end, closest_start, closest_end])
 
         return fixed_lines, fixed_lines_box, line_mistake_refs
     
@@ -515,22 +450,21 @@ class datafiltration:
 
     
     @staticmethod
-    def fix_line_channel_return(fixed_lines, line_mistake_refs, wall_slopes, wall_intercepts, all_walls, line_line_connections_check, line_line_connections):
-        lines_OCO, lines_not_OCO, lines_OCO_refs, lines_not_OCO_refs, lines_cl = maths.Chanel_check_line(wall_slopes, wall_intercepts, fixed_lines, all_walls, line_mistake_refs)
+    def fix_line_channel_return(fixed_lines, line_mistake_refs, outline, line_line_connections_check, line_line_connections):
+        lines_OCO, lines_not_OCO, lines_OCO_refs, lines_not_OCO_refs, lines_cl = maths.Chanel_check_line(outline, fixed_lines, line_mistake_refs)
         
         ll_connections = []
-        # print(f'Initial line line conn mistakes {line_line_connections_check}') 
-        # print(f'The amoutn of initial checks {len(line_line_connections_check)}')   
-        # print(f'Lines on CO {lines_OCO}')
+
+        #Lines on the channel outline by name so each connection check only looks at the lines with its own name 
+        OCO_by_name = {}
+        for line in lines_OCO: 
+            line_name, x_start, y_start, x_end, y_end, _ = line
+            OCO_by_name.setdefault(line_name, []).append((x_start, y_start, x_end, y_end))
 
         for line_l in line_line_connections_check: 
                 name, start_line_name, end_line_name, x_start_c, y_start_c, x_end_c, y_end_c = line_l
-                line_is_OCO = False 
-                for line in lines_OCO: 
-                    line_name, x_start, y_start, x_end, y_end = line
-                    if line_name == name: 
-                        if abs(x_start - x_start_c) < 25 and abs(y_start - y_start_c) < 25 and abs(x_end - x_end_c) < 25 and abs(y_end - y_end_c) < 25: 
-                                line_is_OCO = True 
+                line_is_OCO = any(abs(x_start - x_start_c) < 25 and abs(y_start - y_start_c) < 25 and abs(x_end - x_end_c) < 25 and abs(y_end - y_end_c) < 25 
+                                  for x_start, y_start, x_end, y_end in OCO_by_name.get(name, ()))
 
                 if not line_is_OCO: 
                     ll_connections.append([name, start_line_name, end_line_name, x_start_c, y_start_c, x_end_c, y_end_c])
@@ -561,10 +495,8 @@ class datafiltration:
             y_start_f = fixed_line[2]
             x_end_f = fixed_line[3]
             y_end_f = fixed_line[4]
-            cl_st_slope = fixed_line[5]
-            cl_st_intercept = fixed_line[6]
-            cl_ed_slope = fixed_line[7]
-            cl_ed_intercept = fixed_line[8]
+            closest_start = fixed_line[5]
+            closest_end = fixed_line[6]
 
             if abs(x_start_m - x_start_f) >= 0.1 or abs(y_start_m - y_start_f) >= 0.1: 
                 line_mistake_points.append([x_start_f, y_start_f])
@@ -574,11 +506,11 @@ class datafiltration:
                 line_mistake_points.append([x_end_f, y_end_f]) 
                 find_error.append([x_end_f, y_end_f])
             
-            if cl_st_slope is None and cl_st_intercept is None: 
+            if closest_start is None: 
                 line_mistake_points.append([x_start_f, y_start_f]) 
                 none_error.append({x_start_f, y_start_f}) 
                     
-            if cl_ed_slope is None and cl_ed_intercept is None: 
+            if closest_end is None: 
                 line_mistake_points.append([x_end_f, y_end_f])
                 none_error.append([x_end_f, y_end_f])    
 
@@ -590,52 +522,53 @@ class datafiltration:
         block_tolerences = self.block_tolerence(blockrefs)
         line_block_connections = [] 
         lines = correct_lines + fixed_lines
+
+        #Each block is indexed by the box that any of the checks in block_connection can match in (its size plus the tolerance of 1),
+        #each line end then only goes through the blocks whose box holds it. The blocks come back in order so the last match still wins 
+        reach = 1 + 1e-6
+        x = np.array([block[1] for block in block_tolerences], dtype=float)
+        y = np.array([block[2] for block in block_tolerences], dtype=float)
+        x_size = np.array([block[3] or 0 for block in block_tolerences], dtype=float)
+        y_size = np.array([block[4] or 0 for block in block_tolerences], dtype=float)
+        block_boxes = BoxGrid(x - x_size - reach, y - y_size - reach, x + x_size + reach, y + y_size + reach)
       
         for line in lines: 
             name, x_start, y_start, x_end, y_end, offset = line 
             block_name_start = None 
             block_name_end = None  
          
-            for block in block_tolerences: 
-                block_name, x, y, x_tolerence, y_tolerence = block 
+            for i in block_boxes.containing(x_start, y_start).tolist(): 
+                if self.block_connection(name, x_start, y_start, block_tolerences[i]): 
+                    block_name_start = block_tolerences[i][0]
 
-                tol = 1
-
-                if x_tolerence is None and y_tolerence is None: 
-                    if (abs(x_start - x) < 1 and abs(y_start - y) < 1):
-                        block_name_start = block_name 
-                    if abs(x_end - x) < 1 and abs(y_end - y) < 1: 
-                        block_name_end = block_name #
-
-                elif name == 'WALL':  #if walls start or end within the range of the block its on it
-                    if (x - x_tolerence - tol) <= x_start <= (x + x_tolerence + tol) and (y - y_tolerence - tol) <= y_start <= (y_tolerence + y + tol):
-                        block_name_start = block_name 
-                    if (x - x_tolerence - tol) <= x_end <= (x + x_tolerence + tol) and (y - y_tolerence - tol) <= y_end <= (y_tolerence + y + tol):   
-                        block_name_end = block_name 
-
-                else: #Below are the scenarios of positions a line could be at, at the end of a block to be considered drawn to that block 
-                    if ((abs(x_start - (x + x_tolerence)) < 1 and abs(y_start - y) < 1) or  
-                        (abs(x_start - (x - x_tolerence)) < 1 and abs(y_start - y) < 1) or 
-                        (abs(x_start - x) <1 and abs(y_start - (y + y_tolerence)) < 1) or 
-                        (abs(x_start - x) < 1 and abs(y_start - (y - y_tolerence)) < 1) or
-                        (abs(x_start - x) < 1 and abs(y_start - y) < 1 )
-                        ): 
-                        block_name_start = block_name 
-                     
-                    if  ((abs(x_end - (x + x_tolerence)) < 1 and abs(y_end - y) < 1) or 
-                        (abs(x_end - (x - x_tolerence)) < 1 and abs(y_end - y) < 1) or 
-                        (abs(x_end - x) < 1 and abs(y_end - (y + y_tolerence)) < 1) or 
-                        (abs(x_end - x) < 1 and abs(y_end - (y - y_tolerence)) < 1) or 
-                        (abs(x_end - x) < 1 and abs(y_end - y) < 1) 
-                        ): 
-                        block_name_end = block_name 
+            for i in block_boxes.containing(x_end, y_end).tolist(): 
+                if self.block_connection(name, x_end, y_end, block_tolerences[i]): 
+                    block_name_end = block_tolerences[i][0]
                     
-               
             line_block_connections.append([name, block_name_start, block_name_end, x_start, y_start, x_end, y_end]) 
         filtered_line_conns = self.filter_line_block_connections(line_block_connections) 
 
         return filtered_line_conns     
     
+    @staticmethod
+    def block_connection(name, x_point, y_point, block): 
+        """Checks if the end (x_point, y_point) of a line called name is drawn to the block"""
+        block_name, x, y, x_tolerence, y_tolerence = block 
+        tol = 1
+
+        if x_tolerence is None and y_tolerence is None: 
+            return abs(x_point - x) < 1 and abs(y_point - y) < 1
+
+        if name == 'WALL':  #if walls start or end within the range of the block its on it
+            return (x - x_tolerence - tol) <= x_point <= (x + x_tolerence + tol) and (y - y_tolerence - tol) <= y_point <= (y_tolerence + y + tol)
+
+        #Below are the scenarios of positions a line could be at, at the end of a block to be considered drawn to that block 
+        return ((abs(x_point - (x + x_tolerence)) < 1 and abs(y_point - y) < 1) or  
+                (abs(x_point - (x - x_tolerence)) < 1 and abs(y_point - y) < 1) or 
+                (abs(x_point - x) <1 and abs(y_point - (y + y_tolerence)) < 1) or 
+                (abs(x_point - x) < 1 and abs(y_point - (y - y_tolerence)) < 1) or
+                (abs(x_point - x) < 1 and abs(y_point - y) < 1 ))
+
     def filter_line_block_connections(self, line_block_connections): 
         filtered_line_conn = []
         for line in line_block_connections: 
@@ -0,0 +1,345 @@
+import copy
+from dataclasses import dataclass, field
+from ezdxf.addons import iterdxf
+from ezdxf.document import Drawing
+from ezdxf.entities import factory, DXFEntity
+from ezdxf.lldxf import const
+from ezdxf.lldxf.extendedtags import ExtendedTags
+from backend.mathematical import Mathematical
+
+maths = Mathematical()
+
+
+@dataclass
+class BlockRef:
+    """A block reference as the geometry engine sees it. name_error is None/True for a normal block,
+       for blocks found inside another block it holds the name of the parent block"""
+    name: str
+    x: float
+    y: float
+    angle: float
+    name_error: object
+    handle: str
+    entity: object = None
+
+    def as_point(self):
+        return [self.name, self.x, self.y, self.angle, self.name_error]
+
+
+@dataclass
+class LineRef:
+    """A line in world coordinates, offset is True when the line was moved out of a BEDIT container"""
+    layer: str
+    x_start: float
+    y_start: float
+    x_end: float
+    y_end: float
+    offset: bool
+    handle: str
+    entity: object = None
+
+    def as_line(self):
+        return [self.layer, self.x_start, self.y_start, self.x_end, self.y_end, self.offset]
+
+
+@dataclass
+class WallRef:
+    """A channel outline polyline, points are [x, y] pairs in world coordinates"""
+    points: list
+    handle: str
+    entity: object = None
+
+
+@dataclass
+class BlockDefinition:
+    """What a block definition contains, in block coordinates. It only depends on the definition so it is worked out
+       once per block name and moved to each block reference by adding the insert point.
+       inserts: [resolved name, x offset, y offset, entity], lines: [layer, x start, y start, x end, y end, entity],
+       walls: [points, entity] for channel outline polylines.
+       nested_name, offset and name_error describe blocks pasted inside the block (the last nested block wins)"""
+    name: str
+    inserts: list = field(default_factory=list)
+    lines: list = field(default_factory=list)
+    walls: list = field(default_factory=list)
+    nested_name: str = None
+    offset: tuple = None
+    name_error: object = None
+
+
+@dataclass
+class DrawingModel:
+    """Everything the analysis needs from the dxf file, extracted in a single pass over modelspace.
+       blocks_fil holds the modelspace block references inside the drawing area, bedit_check is their count
+       (1 means all contents of the module sit inside a single BEDIT container block)"""
+    blocks: list = field(default_factory=list)
+    lines: list = field(default_factory=list)
+    walls: list = field(default_factory=list)
+    blocks_fil: list = field(default_factory=list)
+    bedit_check: int = 0
+
+    @property
+    def blockref_points(self):
+        return [block.as_point() for block in self.blocks]
+
+    @property
+    def insert_refs(self):
+        return [block.entity for block in self.blocks]
+
+    @property
+    def all_lines(self):
+        return [line.as_line() for line in self.lines]
+
+    @property
+    def line_refs(self):
+        return [line.entity for line in self.lines]
+
+    @property
+    def all_walls(self):
+        return [wall.points for wall in self.walls]
+
+    @property
+    def wall_point_refs(self):
+        return [wall.entity for wall in self.walls]
+
+
+def extract_drawing(doc):
+    """Builds the DrawingModel from a loaded ezdxf document"""
+    return build_model(doc.modelspace(), BlockIndex(doc))
+
+
+def stream_drawing(filepath):
+    """Low memory version of extract_drawing, modelspace entities are streamed from the file without loading the document
+       and block definitions are only read when a block reference needs them. Entities in the model are not bound to a
+       document, use bind_refs once the document has been loaded for writing"""
+    source = iterdxf.opendxf(filepath)
+    try:
+        return build_model(source.modelspace(types=['INSERT', 'LINE', 'LWPOLYLINE', 'ATTRIB', 'SEQEND']),
+                           StreamingBlockIndex(source))
+    finally:
+        source.close()
+
+
+def build_model(entities, blocks):
+    """Visits the modelspace entities once grouping INSERT, LINE and channel outline LWPOLYLINE entities by dxftype,
+       then builds the DrawingModel from the groups"""
+    groups = {'INSERT': [], 'LINE': [], 'LWPOLYLINE': []}
+    for entity in entities:
+        group = groups.get(entity.dxftype())
+        if group is not None:
+            group.append(entity)
+
+    model = DrawingModel()
+    model.blocks_fil = maths.blockcheck([[insert.dxf.name, round(insert.dxf.insert.x, 2), round(insert.dxf.insert.y, 2)]
+                                         for insert in groups['INSERT']])
+    model.bedit_check = len(model.blocks_fil)
+
+    for insert in groups['INSERT']:
+        blockName = insert.dxf.name
+        x = round(insert.dxf.insert.x, 2)
+        y = round(insert.dxf.insert.y, 2)
+        angle = round(insert.dxf.rotation, 2)
+
+        if model.bedit_check == 1 and blockName != model.blocks_fil[0][0]:
+            continue
+
+        definition = blocks.definition(blocks.resolve(blockName))
+
+        if model.bedit_check == 1:
+            extract_container(model, definition, x, y, angle)
+        else:
+            model.blocks.append(extract_block(insert, definition, x, y, angle))
+
+    if model.bedit_check != 1:
+        for line in groups['LINE']:
+            model.lines.append(LineRef(line.dxf.layer, round(line.dxf.start.x, 2), round(line.dxf.start.y, 2),
+                                       round(line.dxf.end.x, 2), round(line.dxf.end.y, 2), False, line.dxf.handle, line))
+
+        for polyline in groups['LWPOLYLINE']:
+            if polyline.dxf.layer == 'CHANNEL OUTLINE':
+                model.walls.append(WallRef(extract_polyline_points(polyline), polyline.dxf.handle, polyline))
+
+    return model
+
+
+def bind_refs(doc, refs):
+    """Swaps entity handles (or entities read in streaming mode) for the entities of the loaded document with the same handle"""
+    return [doc.entitydb.get(ref if isinstance(ref, str) else ref.dxf.handle) for ref in refs]
+
+
+def detach_refs(result):
+    """Copy of an AnalysisResult without the document, lists of entity references are swapped for their handles
+       so the result no longer depends on a loaded document (see bind_refs)"""
+    detached = copy.copy(result)
+    for name, item in vars(result).items():
+        if isinstance(item, Drawing):
+            setattr(detached, name, None)
+        elif isinstance(item, list) and item and isinstance(item[0], DXFEntity):
+            setattr(detached, name, [ref.dxf.handle for ref in item])
+    return detached
+
+
+class BlockIndex:
+    """Block definitions of one document indexed by handle, built once per document.
+       Dynamic blocks (*U) are stored as anonymous copies, the AcDbBlockRepBTag xdata holds the handle of the original block
+       so resolving a dynamic block is a dictionary lookup rather than a scan of doc.blocks"""
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.by_handle = {block.dxf.handle: block.dxf.name for block in doc.blocks}
+        self.resolved = {}
+        self.definitions = {}
+
+    def block_record(self, blockName):
+        block = self.doc.blocks.get(blockName)
+        return block.block_record if block is not None else None
+
+    def block_entities(self, name):
+        return self.doc.blocks.get(name)
+
+    def resolve(self, blockName):
+        """Returns the name of the original block"""
+        if blockName not in self.resolved:
+            self.resolved[blockName] = self._resolve(blockName)
+        return self.resolved[blockName]
+
+    def _resolve(self, blockName):
+        if not blockName.startswith('*U'):
+            return blockName
+
+        name = blockName
+        blockRecord = self.block_record(blockName)
+        try:
+            if blockRecord is not None and (xdata := blockRecord.get_xdata("AcDbBlockRepBTag")):
+                for tag in xdata:
+                    if tag.code == 1005 and tag.value in self.by_handle:  #xdata tag to store reference handle
+                        name = self.by_handle[tag.value]
+        except const.DXFValueError:  #Doesn't have indirect dynamic block tag or xdata not available
+            print("Not a dynamic block")
+        return name
+
+    def definition(self, name):
+        """Returns the BlockDefinition of the block called name, analysed on first use"""
+        if name not in self.definitions:
+            self.definitions[name] = self._analyse(name, self.block_entities(name))
+        return self.definitions[name]
+
+    def _analyse(self, name, block_def):
+        definition = BlockDefinition(name)
+
+        for entity in block_def:  #Searching for blocks inside the BEDIT
+            if entity.dxftype() == 'INSERT':
+                x_offset = entity.dxf.insert.x  #find offset inside block
+                y_offset = entity.dxf.insert.y
+                new_name = entity.dxf.name
+                definition.inserts.append([self.resolve(new_name), x_offset, y_offset, entity])
+                definition.nested_name = new_name
+                if x_offset > 0.01 and y_offset > 0.01:
+                    definition.offset = (x_offset, y_offset)
+                if new_name != name:
+                    definition.name_error = True
+                if new_name == name:
+                    definition.name_error = None
+
+            elif entity.dxftype() == 'LINE':
+                definition.lines.append([entity.dxf.layer, entity.dxf.start.x, entity.dxf.start.y,
+                                         entity.dxf.end.x, entity.dxf.end.y, entity])
+
+            elif entity.dxftype() == 'LWPOLYLINE':
+                if entity.dxf.layer == 'CHANNEL OUTLINE':
+                    definition.walls.append([extract_polyline_points(entity), entity])
+
+        return definition
+
+
+class StreamingBlockIndex(BlockIndex):
+    """BlockIndex for streaming mode, the document is never loaded. Block records (names, handles and dynamic block xdata)
+       are read up front as they are small, the entities of a block definition are read from the file the first time
+       the definition is needed"""
+
+    BLOCK_TYPES = ('INSERT', 'LINE', 'LWPOLYLINE')
+
+    def __init__(self, source):
+        self.source = source
+        self.records = {}  #block name -> BLOCK_RECORD entity
+        self.locations = {}  #block name -> (first entity, ENDBLK) positions in the file index
+        self.resolved = {}
+        self.definitions = {}
+
+        for position, value in self._section('TABLES'):
+            if value == 'BLOCK_RECORD':
+                record = self._load(position)
+                self.records[record.dxf.name] = record
+
+        block_start = None
+        for position, value in self._section('BLOCKS'):
+            if value == 'BLOCK':
+                block_start = position
+            elif value == 'ENDBLK' and block_start is not None:
+                self.locations[self._load(block_start).dxf.name] = (block_start + 1, position)
+                block_start = None
+
+        self.by_handle = {record.dxf.handle: name for name, record in self.records.items()}
+
+    def block_record(self, blockName):
+        return self.records.get(blockName)
+
+    def block_entities(self, name):
+        first, last = self.locations.get(name, (0, 0))
+        index = self.source.structure.index
+        return [self._load(position) for position in range(first, last) if index[position].value in self.BLOCK_TYPES]
+
+    def _section(self, section):
+        """Yields (position, entity type) for the entities of a section in the file index"""
+        if section not in self.source.sections:
+            return
+        index = self.source.structure.index
+        position = self.source.sections[section] + 1
+        while position < len(index) and index[position].value != 'ENDSEC':
+            yield position, index[position].value
+            position += 1
+
+    def _load(self, position):
+        index = self.source.structure.index
+        location = index[position].location
+        self.source.file.seek(location)
+        data = self.source.file.read(index[position + 1].location - location)
+        text = data.decode(self.source.encoding, errors=self.source.errors).replace('\r\n', '\n')
+        return factory.load(ExtendedTags.from_text(text))
+
+
+def extract_block(insert, definition, x, y, angle):
+    """Standard block reference, blocks pasted inside the block (name errors) move the reference to the nested block offset"""
+    if definition.offset is not None:
+        x_offset, y_offset = definition.offset
+        return BlockRef(definition.nested_name, x + x_offset, y + y_offset, angle, definition.name, insert.dxf.handle, insert)
+    return BlockRef(definition.name, x, y, angle, definition.name_error, insert.dxf.handle, insert)
+
+
+def extract_container(model, definition, x, y, angle):
+    """All contents of the module are inside one container block, blocks lines and walls are moved into world coordinates"""
+    for new_name, x_offset, y_offset, entity in definition.inserts:
+        model.blocks.append(BlockRef(new_name, round(x + x_offset, 2), round(y + y_offset, 2), angle, definition.name,
+                                     entity.dxf.handle, entity))
+
+    for layer, start_x, start_y, end_x, end_y, entity in definition.lines:
+        model.lines.append(LineRef(layer, round(x + start_x, 2), round(y + start_y, 2),
+                                   round(x + end_x, 2), round(y + end_y, 2), True, entity.dxf.handle, entity))
+
+    for raw_points, entity in definition.walls:
+        offset_points = [
+            [round(x + p[0], 1), round(y + p[1], 1)]
+            for p in raw_points
+            if 10 <= x + p[0] <= 300000 and 10 <= y + p[1] <= 300000
+        ]
+        if offset_points:  # only append if not empty
+            model.walls.append(WallRef(offset_points, entity.dxf.handle, entity))
+
+
+def extract_polyline_points(polyline):  #Convert wall points into x and y points
+    if polyline.dxftype() == 'LWPOLYLINE':
+        wall_points = []
+        for point in polyline.get_points():
+            x = float(round(point[0], 1))
+            y = float(round(point[1], 1))
+            wall_points.append([x, y])
+        return wall_points
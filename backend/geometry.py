@@ -0,0 +1,378 @@
+import math
+import numpy as np
+
+
+class LineSet:
+    """Equations of a set of lines stored as arrays in the implicit form a*x + b*y + c = 0, so vertical and sloped lines are
+       handled the same way.
+       Sloped lines are scaled so b = 1 (a = -slope, c = -intercept) and lines less than 0.3 apart in x are vertical (as calc_slope)
+       with a = 1, b = 0, c = -x. abs(a*x + b*y + c) is then the same distance the checks have always used, the vertical distance
+       to a sloped line and the horizontal distance to a vertical line.
+       Distances are added up as a*x + c + b*y, for sloped lines that is y - (slope*x + intercept) rounded the same way as
+       calc_slope's equations, so points right at a tolerance still land on the same side of it.
+       rows holds [name, a, b, c, x_start, y_start, x_end, y_end] for each line for the loops that go through lines one at a time.
+       members[i] are the indexes in source of the lines that line i stands for, just [i] unless the set was merged"""
+
+    ANGLE_STEP = 1e-6  #radians, lines are grouped by their direction rounded to this when merging
+
+    def __init__(self, names, x_start, y_start, x_end, y_end):
+        self.names = list(names)
+        self.x_start = np.asarray(x_start, dtype=float)
+        self.y_start = np.asarray(y_start, dtype=float)
+        self.x_end = np.asarray(x_end, dtype=float)
+        self.y_end = np.asarray(y_end, dtype=float)
+
+        vertical = np.abs(self.x_end - self.x_start) < 0.3
+        self.a, self.b, self.c = equations(self.x_start, self.y_start, self.x_end, self.y_end, vertical)
+
+        self.rows = [list(row) for row in zip(self.names, self.a.tolist(), self.b.tolist(), self.c.tolist(),
+                     self.x_start.tolist(), self.y_start.tolist(), self.x_end.tolist(), self.y_end.tolist())]
+        self.members = [[i] for i in range(len(self.names))]
+        self.source = self
+
+    @classmethod
+    def from_segments(cls, segments):
+        """segments are [name, x_start, y_start, x_end, y_end]"""
+        if len(segments) == 0:
+            return cls([], [], [], [], [])
+        names, x_start, y_start, x_end, y_end = zip(*segments)
+        return cls(names, x_start, y_start, x_end, y_end)
+
+    def merged(self, tolerance=0.01, keep=()):
+        """A smaller set where collinear segments with the same name that overlap or touch (within tolerance) are one line.
+           Segments are grouped by name, direction and perpendicular offset (rounded to ANGLE_STEP and tolerance), each group is
+           sorted along the line and overlapping intervals are joined. A merged line runs between the furthest apart original
+           end points and members keeps which original lines it covers.
+           Lines whose indexes are in keep are never merged (the channel outline walls, their name is not their own)"""
+        keep = set(keep)
+        groups = {}
+        for i in range(len(self.names)):
+            dx, dy = self.x_end[i] - self.x_start[i], self.y_end[i] - self.y_start[i]
+            if i in keep or (dx == 0 and dy == 0):
+                groups[('single', i)] = [i]  #kept or no direction, never merged
+                continue
+            theta = math.atan2(dy, dx) % math.pi
+            step = round(theta / self.ANGLE_STEP) % round(math.pi / self.ANGLE_STEP)
+            offset = -math.sin(theta) * self.x_start[i] + math.cos(theta) * self.y_start[i]
+            groups.setdefault((self.names[i], step, round(offset / tolerance)), []).append(i)
+
+        merged = []  #[members, (x, y) of the lowest end, (x, y) of the highest end]
+        for members in groups.values():
+            i = members[0]
+            theta = math.atan2(self.y_end[i] - self.y_start[i], self.x_end[i] - self.x_start[i])
+            ux, uy = math.cos(theta), math.sin(theta)
+            intervals = []
+            for m in members:
+                ends = sorted([(self.x_start[m] * ux + self.y_start[m] * uy, (self.x_start[m], self.y_start[m])),
+                               (self.x_end[m] * ux + self.y_end[m] * uy, (self.x_end[m], self.y_end[m]))])
+                intervals.append((ends[0], ends[1], m))
+            intervals.sort(key=lambda interval: interval[0][0])
+
+            low, high, m = intervals[0]
+            current = [[m], low, high]
+            for low, high, m in intervals[1:]:
+                if low[0] <= current[2][0] + tolerance:
+                    current[0].append(m)
+                    if high[0] > current[2][0]:
+                        current[2] = high
+                else:
+                    merged.append(current)
+                    current = [[m], low, high]
+            merged.append(current)
+
+        merged.sort(key=lambda line: min(line[0]))
+        result = LineSet([self.names[min(members)] for members, _, _ in merged],
+                         [low[1][0] for _, low, _ in merged], [low[1][1] for _, low, _ in merged],
+                         [high[1][0] for _, _, high in merged], [high[1][1] for _, _, high in merged])
+        result.members = [sorted(members) for members, _, _ in merged]
+        result.source = self
+        return result
+
+    def __len__(self):
+        return len(self.names)
+
+    def line(self, i):
+        return self.rows[i][1], self.rows[i][2], self.rows[i][3]
+
+    def distances(self, x, y):
+        """Distance of the point (x, y) to every line"""
+        return np.abs(self.a * x + self.c + self.b * y)
+
+
+def equations(x_start, y_start, x_end, y_end, vertical):
+    """(a, b, c) arrays of the lines through the given points, b = 1 for sloped lines and a = 1, b = 0 where vertical is True"""
+    dx = x_end - x_start
+    slope = np.divide(y_end - y_start, dx, out=np.zeros_like(dx), where=~vertical)
+    a = np.where(vertical, 1.0, -slope)
+    b = np.where(vertical, 0.0, 1.0)
+    c = np.where(vertical, -x_start, -(y_start - slope * x_start))  #-intercept
+    return a, b, c
+
+
+PARALLEL = 1e-9  #lines whose directions differ by less than this (relative) are parallel, as solving them with sympy treated them
+
+
+def intersect(a1, b1, c1, a2, b2, c2):
+    """Crossing points of two arrays of lines, solved in closed form with Cramer's rule.
+       parallel is True where the lines never cross (x and y are nan there), lines that are parallel to within rounding
+       (two 45 degree lines whose slopes differ in the last digit) count as parallel instead of crossing miles away"""
+    det = a1 * b2 - a2 * b1
+    parallel = np.abs(det) <= PARALLEL * np.maximum(np.abs(a1 * b2), np.abs(a2 * b1))
+    det = np.where(parallel, 1.0, det)
+    x = np.where(parallel, np.nan, (b1 * c2 - b2 * c1) / det)
+    y = np.where(parallel, np.nan, (a2 * c1 - a1 * c2) / det)
+    return x, y, parallel
+
+
+def move_onto(a, b, c, closest_a, closest_b, closest_c, x, y):
+    """Moves the points (x, y) of the lines (a, b, c) to where they cross the closest lines.
+       Where both lines are vertical the point is snapped across onto the closest line keeping its y,
+       any other parallel lines leave the point where it is"""
+    new_x, new_y, parallel = intersect(a, b, c, closest_a, closest_b, closest_c)
+    both_vertical = parallel & (closest_b == 0)
+    x_snapped = np.divide(-closest_c, closest_a, out=np.zeros_like(closest_c), where=both_vertical)
+    new_x = np.where(both_vertical, x_snapped, np.where(parallel, x, new_x))
+    new_y = np.where(parallel, y, new_y)
+    return new_x, new_y
+
+
+def distance(line, x, y):
+    a, b, c = line
+    return abs(a * x + c + b * y)
+
+
+def project(line, x, y):
+    """Foot of the perpendicular from (x, y) onto the line"""
+    a, b, c = line
+    norm = a * a + b * b
+    return (b * (b * x - a * y) - a * c) / norm, (a * (a * y - b * x) - b * c) / norm
+
+
+class Grid:
+    """Uniform grid over an area, each cell keeps a list of item indexes (ascending) in one flat array.
+       items[starts[cell]:starts[cell + 1]] are the items listed in a cell"""
+
+    MAX_CELLS = 256  #per side
+
+    def __init__(self, x_min, y_min, x_max, y_max, cells):
+        self.nx = self.ny = max(1, min(self.MAX_CELLS, cells))
+        self.x_min, self.y_min = x_min, y_min
+        self.x_max, self.y_max = x_max, y_max
+        self.size_x = max(x_max - x_min, 1e-9) / self.nx
+        self.size_y = max(y_max - y_min, 1e-9) / self.ny
+
+    def column(self, x):
+        return np.clip(np.floor((x - self.x_min) / self.size_x), 0, self.nx - 1).astype(np.int64)
+
+    def row(self, y):
+        return np.clip(np.floor((y - self.y_min) / self.size_y), 0, self.ny - 1).astype(np.int64)
+
+    def cell(self, x, y):
+        """Cell of the point, None if it is outside the grid"""
+        if not (self.x_min <= x <= self.x_max and self.y_min <= y <= self.y_max):
+            return None
+        col = min(int((x - self.x_min) / self.size_x), self.nx - 1)
+        row = min(int((y - self.y_min) / self.size_y), self.ny - 1)
+        return row * self.nx + col
+
+    def fill(self, cell_ids, item_ids):
+        order = np.lexsort((item_ids, cell_ids))
+        self.items = item_ids[order]
+        self.starts = np.zeros(self.nx * self.ny + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cell_ids, minlength=self.nx * self.ny), out=self.starts[1:])
+
+    def listed(self, cell):
+        return self.items[self.starts[cell]:self.starts[cell + 1]]
+
+
+class LineGrid(Grid):
+    """Grid over the area being checked (the extent of the blocks), each cell lists the lines whose band
+       abs(a*x + b*y + c) <= reach passes through the cell. The checks treat lines as infinite, so a line is listed in every
+       cell its band crosses and not just the cells around its segment, a point then only has to be checked against the lines
+       listed in its cell. Lines are listed in ascending order so the first match is the same as going through every line"""
+
+    def __init__(self, lines, x_min, y_min, x_max, y_max, reach, cells=None):
+        super().__init__(x_min, y_min, x_max, y_max, cells or int(math.sqrt(len(lines))) + 1)
+        self.everything = list(range(len(lines)))
+        reach = reach + 1e-6  #so rounding never drops a line right on the edge of the band, the checks themselves are exact
+
+        cell_ids = []
+        line_ids = []
+        vertical = np.flatnonzero(lines.b == 0)
+        sloped = np.flatnonzero(lines.b != 0)
+
+        #vertical lines, a band of columns through every row
+        x_line = -lines.c[vertical] / lines.a[vertical]
+        inside = (x_line + reach >= self.x_min) & (x_line - reach <= self.x_max)
+        ids, cols = spread(vertical[inside], self.column(x_line[inside] - reach), self.column(x_line[inside] + reach))
+        rows = np.arange(self.ny) * self.nx
+        cell_ids.append((cols[:, None] + rows[None, :]).ravel())
+        line_ids.append(np.repeat(ids, self.ny))
+
+        #sloped lines, y = -(a*x + c)/b is worked out at both sides of each column
+        a, b, c = lines.a[sloped], lines.b[sloped], lines.c[sloped]
+        for col in range(self.nx):
+            x_left = self.x_min + col * self.size_x
+            y_left = -(a * x_left + c) / b
+            y_right = -(a * (x_left + self.size_x) + c) / b
+            low = np.minimum(y_left, y_right) - reach
+            high = np.maximum(y_left, y_right) + reach
+            inside = (high >= self.y_min) & (low <= self.y_max)
+            ids, rows = spread(sloped[inside], self.row(low[inside]), self.row(high[inside]))
+            cell_ids.append(rows * self.nx + col)
+            line_ids.append(ids)
+
+        self.fill(np.concatenate(cell_ids), np.concatenate(line_ids))
+
+    def candidates(self, x, y):
+        """Indexes (ascending) of the lines that can be within reach of the point"""
+        cell = self.cell(x, y)
+        if cell is None:
+            return self.everything
+        return self.listed(cell).tolist()
+
+
+class BoxGrid(Grid):
+    """Grid over a set of boxes, each cell lists the boxes that overlap it so the boxes holding a point
+       are found without going through every box"""
+
+    def __init__(self, x_min, y_min, x_max, y_max, cells=None):
+        self.box_x_min = np.asarray(x_min, dtype=float)
+        self.box_y_min = np.asarray(y_min, dtype=float)
+        self.box_x_max = np.asarray(x_max, dtype=float)
+        self.box_y_max = np.asarray(y_max, dtype=float)
+        if len(self.box_x_min) == 0:
+            super().__init__(0.0, 0.0, 0.0, 0.0, 1)
+        else:
+            super().__init__(self.box_x_min.min(), self.box_y_min.min(), self.box_x_max.max(), self.box_y_max.max(),
+                             cells or int(math.sqrt(len(self.box_x_min))) + 1)
+
+        ids, cols = spread(np.arange(len(self.box_x_min)), self.column(self.box_x_min), self.column(self.box_x_max))
+        spots, rows = spread(np.arange(len(ids)), self.row(self.box_y_min[ids]), self.row(self.box_y_max[ids]))
+        self.fill(rows * self.nx + cols[spots], ids[spots])
+
+    def containing(self, x, y):
+        """Indexes (ascending) of the boxes the point is inside (edges included)"""
+        cell = self.cell(x, y)
+        if cell is None:
+            return self.items[:0]
+        ids = self.listed(cell)
+        inside = ((self.box_x_min[ids] <= x) & (x <= self.box_x_max[ids]) &
+                  (self.box_y_min[ids] <= y) & (y <= self.box_y_max[ids]))
+        return ids[inside]
+
+    def containing_any(self, points):
+        """Indexes (ascending) of the boxes at least one of the points is inside"""
+        return np.unique(np.concatenate([self.containing(x, y) for x, y in points]))
+
+
+def spread(ids, first, last):
+    """Repeats each id once for every position from first to last (inclusive), returns the ids and positions"""
+    counts = last - first + 1
+    ids = np.repeat(ids, counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return ids, np.repeat(first, counts) + offsets
+
+
+class OutlineGeometry:
+    """The channel outline worked out once, the bounding box of all its points and the equations of its edges (a LineSet).
+       Most edges are vertical (a = 1, b = 0) or horizontal (a = 0, b = 1), for those the distance is just abs(x + c) or abs(y + c)
+       so their c values are kept sorted and a point only has to be checked against the few values next to it.
+       Sloped edges are checked the general way"""
+
+    CHUNK = 4096  #points checked against every sloped edge at once, keeps the points x edges arrays small
+
+    def __init__(self, edges):
+        self.edges = edges
+        if len(edges) == 0:  #no outline, nothing can be inside it
+            self.min_x = self.min_y = math.inf
+            self.max_x = self.max_y = -math.inf
+        else:
+            self.min_x = float(edges.x_start.min())
+            self.min_y = float(edges.y_start.min())
+            self.max_x = float(edges.x_start.max())
+            self.max_y = float(edges.y_start.max())
+
+        vertical = edges.b == 0
+        horizontal = ~vertical & (edges.a == 0)
+        self.vertical_c = np.unique(edges.c[vertical])
+        self.horizontal_c = np.unique(edges.c[horizontal])
+        self.sloped = np.flatnonzero(~vertical & ~horizontal)
+
+    def inside(self, x, y, margin=0.2):
+        """True where the points are inside the bounding box grown by margin"""
+        return (x >= self.min_x - margin) & (x <= self.max_x + margin) & (y >= self.min_y - margin) & (y <= self.max_y + margin)
+
+    def residuals(self, x, y):
+        """abs(a*x + b*y + c) of the points against every sloped edge, one row per point"""
+        a, b, c = self.edges.a[self.sloped], self.edges.b[self.sloped], self.edges.c[self.sloped]
+        return np.abs(a[None, :] * x[:, None] + c[None, :] + b[None, :] * y[:, None])
+
+    def on_outline(self, x_start, y_start, x_end, y_end, tolerance=0.2):
+        """True for lines that are inside the bounding box and have both ends within tolerance of the same edge"""
+        x_start, y_start = np.asarray(x_start, dtype=float), np.asarray(y_start, dtype=float)
+        x_end, y_end = np.asarray(x_end, dtype=float), np.asarray(y_end, dtype=float)
+        result = self.inside(x_start, y_start, tolerance) & self.inside(x_end, y_end, tolerance)
+        on_axis = axis_near(self.vertical_c, x_start, x_end, tolerance) | axis_near(self.horizontal_c, y_start, y_end, tolerance)
+
+        for first in range(0, len(result), self.CHUNK):
+            part = slice(first, first + self.CHUNK)
+            near_start = self.residuals(x_start[part], y_start[part]) < tolerance
+            near_end = self.residuals(x_end[part], y_end[part]) < tolerance
+            on_axis[part] |= (near_start & near_end).any(axis=1)
+        return result & on_axis
+
+    def near_edge(self, x, y, tolerance=1):
+        """True for points within tolerance of any edge (edges as infinite lines, no bounding box check)"""
+        x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        result = axis_near(self.vertical_c, x, x, tolerance) | axis_near(self.horizontal_c, y, y, tolerance)
+
+        for first in range(0, len(result), self.CHUNK):
+            part = slice(first, first + self.CHUNK)
+            result[part] |= (self.residuals(x[part], y[part]) < tolerance).any(axis=1)
+        return result
+
+
+def axis_near(values, first, second, tolerance):
+    """True where one of the sorted values c has both abs(first + c) and abs(second + c) under tolerance.
+       The best c is the one closest to -(first + second)/2 so only the values either side of that are checked"""
+    result = np.zeros(len(first), dtype=bool)
+    if len(values) == 0:
+        return result
+    spot = np.searchsorted(values, -(first + second) / 2)
+    for step in (-2, -1, 0, 1):
+        c = values[np.clip(spot + step, 0, len(values) - 1)]
+        result |= (np.abs(first + c) < tolerance) & (np.abs(second + c) < tolerance)
+    return result
+
+
+class PointIndex:
+    """Points hashed into square cells of side radius, so the points within radius of a spot are all in the 3x3 cells around it"""
+
+    def __init__(self, points, radius):
+        self.points = [(point[0], point[1]) for point in points]
+        self.size = radius * (1 + 1e-9) + 1e-9  #so rounding never puts a point within radius two cells away
+        self.cells = {}
+        for i, (x, y) in enumerate(self.points):
+            self.cells.setdefault(self.key(x, y), []).append(i)
+
+    def key(self, x, y):
+        return math.floor(x / self.size), math.floor(y / self.size)
+
+    def nearest(self, x, y, radius):
+        """(index, distance) of the closest point if it is within radius (the first one listed on a tie), (None, inf) otherwise"""
+        col, row = self.key(x, y)
+        nearby = []
+        for i in range(col - 1, col + 2):
+            for j in range(row - 1, row + 2):
+                nearby.extend(self.cells.get((i, j), ()))
+
+        closest, min_dist = None, float('inf')
+        for i in sorted(nearby):
+            x_point, y_point = self.points[i]
+            dist = math.sqrt((x_point - x)**2 + (y_point - y)**2)
+            if dist < min_dist:
+                closest, min_dist = i, dist
+        if min_dist > radius:
+            return None, float('inf')
+        return closest, min_dist
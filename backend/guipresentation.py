@@ -1,4 +1,18 @@
 
+import numpy as np
+
+
+def near_any(values, points, tolerance): 
+    #values are sorted, the closest values to each point are the ones either side of where it would be inserted, all points are checked at once 
+    points = np.asarray(points, dtype=float)
+    if len(values) == 0: 
+        return [False] * len(points)
+    spot = np.searchsorted(values, points)
+    before = values[np.maximum(spot - 1, 0)]
+    after = values[np.minimum(spot, len(values) - 1)]
+    return ((np.abs(points - before) <= tolerance) | (np.abs(points - after) <= tolerance)).tolist()
+
+
 class presentation: 
     """This class establishes lists to allow for neat presenation of results inside GUI
        This class contains two functions 
@@ -19,23 +33,29 @@ class presentation:
         on_line_points = []
         all_lines_table = []
 
-        wall_x_coords = [point[0] for point in filtered_walls]
-        wall_y_coords = [point[1] for point in filtered_walls]
+        wall_x_coords = np.sort([point[0] for point in filtered_walls]).astype(float)
+        wall_y_coords = np.sort([point[1] for point in filtered_walls]).astype(float)
+
+        block_near_x = near_any(wall_x_coords, [block[1] for block in blocks_on_line], tolerance)
+        block_near_y = near_any(wall_y_coords, [block[2] for block in blocks_on_line], tolerance)
 
-        for block in blocks_on_line:
+        for idx, block in enumerate(blocks_on_line):
             name, x, y, angle, wall, wall_type, on_line, mistake = block 
 
-            if any(abs(x - wall_x) <= tolerance for wall_x in wall_x_coords) or any(abs(y-wall_y) <= tolerance for wall_y in wall_y_coords): 
+            if block_near_x[idx] or block_near_y[idx]: 
                 on_line_points.append([name, x, y, angle, wall, wall_type, on_line, mistake, 'Yes'])
             else: 
                 on_line_points.append([name, x, y, angle, wall, wall_type, on_line, mistake, 'No'])
 
-        for line in all_lines:
+        line_near_x = near_any(wall_x_coords, [line[1] for line in all_lines], tolerance)
+        line_near_y = near_any(wall_y_coords, [line[2] for line in all_lines], tolerance)
+
+        for idx, line in enumerate(all_lines):
             name, x_start, y_start, x_end, y_end, offset = line
 
-            if any(abs(x_start - wall_x) <= tolerance for wall_x in wall_x_coords):  # Check if line is on a vertical wall (x_start == x_end and that x is a wall x)
+            if line_near_x[idx]:  # Check if line is on a vertical wall (x_start == x_end and that x is a wall x)
                     all_lines_table.append([name, x_start, y_start, x_end, y_end, 'Yes'])
-            elif any(abs(y_start - wall_y) <= tolerance for wall_y in wall_y_coords):
+            elif line_near_y[idx]:
                 all_lines_table.append([name, x_start, y_start, x_end, y_end, 'Yes'])
             else: 
                 all_lines_table.append([name, x_start, y_start, x_end, y_end, 'No'])  
@@ -1,15 +1,15 @@
-from sympy import symbols, Eq, solve
 import math
+from backend.geometry import LineSet, OutlineGeometry, distance
 
 
 class Mathematical:
     """This class does the backend maths calculations for the interface and updated dxf 
        This class contains six functison 
        wall_len: This calculates the length of walls 
-       slope_vales: Function goes through different line situatiosn returning slope, intercept, start and end values fore each line and wall. 
+       slope_vales: Function goes through different line situatiosn returning slope, intercept (for presentation) and the equations of each line and wall (LineSet). 
        calc_slope: returns actual slope and intercept value so calculation does not need to be repeated for different scenarios 
        Shape_outline: Filters through all blocks and lines to ensure only data being picked up is wanted. 
-       find_distance_to_line: Subs points into equation of a line 
+       find_distance_to_line: Subs points into equation of a line (a, b, c) 
        solve_simultaneous_equations: solves simealtaneous equations for where a point should be position on a line """
 
     @staticmethod
@@ -27,32 +27,31 @@ class Mathematical:
     def slope_values(all_lines, all_walls):
         #takes all lines and all_walls from autocad 
         #This function creates the equation of the line for each line (Channel outline and interior lines)
-        #Functions accounts for vertical lines
+        #Slopes and intercepts are kept for the Wall Properties table, the checks use the LineSet equations which account for vertical lines 
 
         slopes = [] 
         y_intercepts = []
-        line_properties = []
-        wall_slopes = []
-        wall_intercepts = []
+        segments = []
+        wall_segments = []
 
         for line in all_lines: 
             line_name, x_start, y_start, x_end, y_end, mistake = line  
             line_slopes, line_intercepts = Mathematical.calc_slope(x_start, y_start, x_end, y_end)
             slopes.append(line_slopes)
             y_intercepts.append(line_intercepts)
-            line_properties.append([line_name, line_slopes, line_intercepts, x_start, y_start, x_end, y_end])
+            segments.append([line_name, x_start, y_start, x_end, y_end])
                     
         for walls in all_walls:  
             for i in range(len(walls)):  
                 p1 = walls[i]
                 p2 = walls[(i+1) % len(walls)]
 
-                slope_wall, intercept_wall = Mathematical.calc_slope(p1[0], p1[1], p2[0], p2[1])
-                wall_slopes.append(slope_wall)
-                wall_intercepts.append(intercept_wall)  
-                line_properties.append([line_name, slope_wall, intercept_wall, p1[0], p1[1], p2[0], p2[1]])  
+                wall_segments.append([line_name, p1[0], p1[1], p2[0], p2[1]])
 
-        return slopes, y_intercepts, line_properties, wall_slopes, wall_intercepts
+        line_properties = LineSet.from_segments(segments + wall_segments)
+        outline = OutlineGeometry(LineSet.from_segments(wall_segments))
+
+        return slopes, y_intercepts, line_properties, outline
 
     @staticmethod
     def calc_slope(x1, y1, x2, y2):
@@ -113,99 +112,53 @@ class Mathematical:
     
 
     @staticmethod
-    def find_distance_to_line(x_point, y_point, slope, intercept):
-        if slope is None:
-            x_intercept = float(intercept.split()[2])
-            return abs(x_point - x_intercept)
-
-        else:
-            return abs(y_point - (slope * x_point + intercept))
+    def find_distance_to_line(x_point, y_point, line):
+        return distance(line, x_point, y_point)
 
     @staticmethod
     def solve_simultaneous_equations(closest_slope, closest_intercept, slope_line, intercept_line):
-        x, y = symbols('x y')
-        eq1 = Eq(y, closest_slope * x + closest_intercept)
-        eq2 = Eq(y, slope_line * x + intercept_line)
-        solution = solve((eq1, eq2), (x, y))
-        if not solution or x not in solution or y not in solution:
+        #y = m1*x + c1 and y = m2*x + c2 cross at x = (c2 - c1) / (m1 - m2), parallel lines never cross 
+        if closest_slope == slope_line:
             return None, None
-        return float(solution[x]), float(solution[y])
+        x = (intercept_line - closest_intercept) / (closest_slope - slope_line)
+        return x, closest_slope * x + closest_intercept
     
     @staticmethod
-    def Channel_check_block(wall_slopes, wall_intercepts, blockrefs): 
+    def Channel_check_block(outline, blockrefs): 
+        #A block is on the channel if it is within 1 of any outline edge, all blocks are checked at once 
         blocks = []
 
-        for block in blockrefs: 
+        if len(blockrefs) > 0: 
+            _, x, y, _, _ = zip(*blockrefs)
+            on_channel = outline.near_edge(x, y, 1).tolist()
+        else: 
+            on_channel = []
+
+        for idx, block in enumerate(blockrefs): 
             block_name, x, y, angle, _ = block 
-            on_channel = 'No'
-
-            for i in range(len(wall_slopes)): 
-                wall_slope = wall_slopes[i]
-                wall_intercept = wall_intercepts[i]
-
-                if wall_slope is None: 
-                    x_intercept = float(wall_intercept.split()[2])
-                    x_d = abs(x_intercept - x)
-                    if x_d < 1: 
-                        on_channel = 'Yes'
-                        break       
-                else: 
-                    y_d = abs(y - (wall_slope * x + wall_intercept))
-                    if y_d < 1: 
-                        on_channel = 'Yes'
-                        break 
+            blocks.append([block_name, x, y, angle, 'Yes' if on_channel[idx] else 'No'])
 
-            blocks.append([block_name, x, y, angle, on_channel])
         return blocks
 
     @staticmethod
-    def Chanel_check_line(wall_slopes, wall_intercepts, lines, all_walls, line_refs): 
+    def Chanel_check_line(outline, lines, line_refs): 
+        #A line is on the channel outline if it is inside the outline boundaries and both ends are on the same outline edge, all lines are checked at once 
         lines_OCO = []
         lines_OCO_refs = []
         lines_not_OCO = []
         lines_not_OCO_refs = []
         lines_cl = []
 
+        if len(lines) > 0: 
+            _, x_start, y_start, x_end, y_end, _ = zip(*lines)
+            on_channel = outline.on_outline(x_start, y_start, x_end, y_end).tolist()
+        else: 
+            on_channel = []
 
         for idx, line in enumerate(lines): 
             name, x_start, y_start, x_end, y_end, offset = line
 
-            min_x = min(x for wall in all_walls for x, y in wall) #finding the boundaries of the shape 
-            min_y = min(y for wall in all_walls for x,y in wall)
-            max_x = max(x for wall in all_walls for x, y in wall)
-            max_y = max(y for wall in all_walls for x, y in wall)
-
-            # Check boundaries ONCE (no loop needed)
-            if (x_start < (min_x - 0.2) or x_start > (max_x + 0.2) or y_start < (min_y- 0.2) or y_start > (max_y + 0.2) or
-                x_end < (min_x - 0.2) or x_end > (max_x + 0.2) or y_end < (min_y - 0.2) or y_end > (max_y + 0.2)):
-                lines_not_OCO.append([name, x_start, y_start, x_end, y_end, offset])
-                lines_not_OCO_refs.append(line_refs[idx])
-                lines_cl.append([name, x_start, y_start, x_end, y_end, 'No'])
-                
-                continue
-            on_channel_outline = False 
-
-            for i in range(len(wall_slopes)): 
-                wall_slope = wall_slopes[i]
-                wall_intercept = wall_intercepts[i]
-                
-                # Main check for a point on the channel outline
-                if wall_slope is None:  # Vertical wall
-                    x_intercept = float(wall_intercept.split()[2]) 
-                    x_sd = abs(x_intercept - x_start)
-                    x_ed = abs(x_intercept - x_end)
-                    if x_ed < 0.2 and x_sd < 0.2:
-                        on_channel_outline = True 
-                        break
-                      
-                else:  # Wall with slope
-                    y_ss = abs(y_start - (wall_slope * x_start + wall_intercept))
-                    y_ee = abs(y_end - (wall_slope * x_end + wall_intercept))
-                    if y_ss < 0.2 and y_ee < 0.2: 
-                        on_channel_outline = True 
-                        break
-
-            if on_channel_outline: 
+            if on_channel[idx]: 
                 lines_OCO.append([name, x_start, y_start, x_end, y_end, offset])
                 lines_OCO_refs.append(line_refs[idx]) 
                 lines_cl.append([name, x_start, y_start, x_end, y_end, 'Yes'])
@@ -225,26 +178,22 @@ class Mathematical:
 
         finals_corrected_blocks = []
 
+        #The first mistake point for each name, that is the one each corrected block is compared against 
+        first_mistakes = {}
+        for mistake_block in mistake_points: 
+            first_mistakes.setdefault(mistake_block[0], mistake_block)
+
         for block in final_corrected_blocks: 
             name, x, y, angle, name_error = block 
+            mistake_block = first_mistakes.get(name)
 
-            if len(mistake_points) == 0:
-                finals_corrected_blocks.append([name, x, y, angle, name_error])
-                continue
-
-            matched = False
-            for mistake_block in mistake_points: 
+            if mistake_block is not None: 
                 name_m, x_m, y_m, angle_m, name_error_m = mistake_block
-
-                if name_m == name: 
-                    matched = True
-                    if abs(x_m - x) < 0.01 and abs(y_m - y) < 0.01: 
-                        finals_corrected_blocks.append([name, None, None, None, None])
-                    else: 
-                        finals_corrected_blocks.append([name, x, y, angle, name_error])
-                    break 
-
-            if not matched:
+                if abs(x_m - x) < 0.01 and abs(y_m - y) < 0.01: 
+                    finals_corrected_blocks.append([name, None, None, None, None])
+                else: 
+                    finals_corrected_blocks.append([name, x, y, angle, name_error])
+            else:
                 finals_corrected_blocks.append([name, x, y, angle, name_error])
 
         return finals_corrected_blocks               
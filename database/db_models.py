@@ -1,15 +1,15 @@
 import sys
 import os
 import shutil
-from sqlalchemy import create_engine, Column, Integer, String
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy import create_engine, event, inspect, Column, Integer, String, ForeignKey, text
+from sqlalchemy.orm import declarative_base, sessionmaker, relationship
 
 Base = declarative_base()
 
 class ObjectID(Base):
     __tablename__ = 'objects'
     object_id = Column(Integer, primary_key=True)
-    name = Column(String, nullable=False)
+    name = Column(String, nullable=False, unique=True, index=True)
     type = Column(String, nullable=False)
     category = Column(String)
     on_channel_outline = Column(String)
@@ -17,9 +17,167 @@ class ObjectID(Base):
 class CategoryLineRule(Base):
     __tablename__ = 'category_line_rules'
     id = Column(Integer, primary_key=True)
-    category = Column(String, nullable=False)
-    allowed_connections = Column(String)
+    category = Column(String, nullable=False, unique=True, index=True)
     double_connection = Column(String, nullable=False)
+    connections = relationship('CategoryConnection', order_by='CategoryConnection.position', 
+                               cascade='all, delete-orphan', back_populates='rule')
+
+    @property
+    def allowed_connections(self): 
+        """The allowed connections as the comma-joined string they used to be stored as"""
+        if not self.connections: 
+            return None 
+        return ','.join(conn.connection for conn in self.connections)
+
+    @allowed_connections.setter
+    def allowed_connections(self, value): 
+        #takes the comma-joined string or a list/tuple of categories 
+        if isinstance(value, str): 
+            value = value.split(',')
+        parts = [part.strip() for part in value or () if part.strip()]
+        self.connections = [CategoryConnection(connection=part, position=i) for i, part in enumerate(parts)]
+
+class CategoryConnection(Base):
+    __tablename__ = 'category_connections'
+    id = Column(Integer, primary_key=True)
+    rule_id = Column(Integer, ForeignKey('category_line_rules.id'), nullable=False, index=True)
+    position = Column(Integer, nullable=False)
+    connection = Column(String, nullable=False)
+    rule = relationship('CategoryLineRule', back_populates='connections')
+
+SCHEMA_VERSION = 1  #stored in the database file as PRAGMA user_version 
+
+def objects_view(rows): 
+    """What the catalogue checks in db_objects can see of the objects rows (name, type, category, on_channel_outline) in table order:
+       the first category for each name, the first on_channel_outline for each block name and, for lines, whether a row on/off 
+       the channel outline comes before each name's first row (name_match_block looks at every row up to the match)"""
+    by_name = {}
+    insert_names = {}
+    first = {}
+    first_on_channel = {}
+    count = 0 
+    for name, type, category, on_channel_outline in rows: 
+        by_name.setdefault(name.upper(), category)
+        if type not in ('LINE', 'LWPOLYLINE'):
+            insert_names.setdefault(name.upper(), on_channel_outline)
+        if type not in ('INSERT', 'LWPOLYLINE'):
+            first.setdefault(name.upper(), count)
+            first_on_channel.setdefault(on_channel_outline, count)
+            count += 1 
+
+    def verified(last): 
+        return first_on_channel.get('Yes', count) <= last, first_on_channel.get('No', count) <= last
+
+    lines = {name: verified(position) for name, position in first.items()}
+    return by_name, insert_names, lines, verified(0), verified(count - 1), count > 0
+
+def merge_rules(rules): 
+    """Merges the rows of each category into one rule. validate_categories applied every row of a category in turn, that is 
+       the same as one rule only if the allowed connections of the rows are nested (the largest set then decides) with 
+       double_connection 'Yes' if any row had it. Returns the merged rules (id of the first row, category, connections, double_connection)
+       and the categories whose rows can not be merged"""
+    by_category = {}
+    for rule_id, category, allowed_connections, double_connection in rules: 
+        parts = [part.strip() for part in (allowed_connections or '').split(',') if part.strip()]
+        by_category.setdefault(category, []).append((rule_id, parts, double_connection))
+
+    merged = []
+    conflicts = []
+    for category, rows in by_category.items(): 
+        largest = max((parts for _, parts, _ in rows), key=lambda parts: len(set(parts)))
+        if any(not set(parts) <= set(largest) for _, parts, _ in rows): 
+            conflicts.append(category)
+            continue 
+        double_connection = 'Yes' if any(double == 'Yes' for _, _, double in rows) else rows[0][2]
+        merged.append((rows[0][0], category, largest, double_connection))
+    return merged, conflicts
+
+def migrate(engine): 
+    """Brings an existing database up to SCHEMA_VERSION, new tables are created and each revision below is applied in turn.
+       Revision 1: objects.name and category_line_rules.category become unique and the comma-joined allowed_connections column 
+       is replaced by the category_connections table (the column is dropped by rebuilding the table, so older builds can not 
+       read rules that have gone stale). Duplicate rows are only removed or merged when that leaves every check with the same 
+       result, otherwise the upgrade is refused. The database file is copied to objectdatabase.db.v<version>.bak first"""
+    path = engine.url.database 
+    with engine.connect() as conn: 
+        version = conn.execute(text('PRAGMA user_version')).scalar()
+        tables = inspect(conn).get_table_names()
+        rule_columns = [row[1] for row in conn.execute(text('PRAGMA table_info(category_line_rules)'))]
+        legacy = 'allowed_connections' in rule_columns 
+        objects = []
+        if version < 1 and 'objects' in tables: 
+            objects = conn.execute(text('SELECT object_id, name, type, category, on_channel_outline FROM objects ORDER BY object_id')).fetchall()
+        rules = []
+        if legacy: 
+            rules = conn.execute(text('SELECT id, category, allowed_connections, double_connection FROM category_line_rules ORDER BY id')).fetchall()
+
+    if version >= SCHEMA_VERSION and not legacy: 
+        Base.metadata.create_all(engine)
+        return 
+
+    #revision 1 checks, nothing is changed if the upgrade has to be refused 
+    kept = {}
+    for row in objects: 
+        kept.setdefault(row[1], row)
+    duplicate_objects = [row for row in objects if kept[row[1]] is not row]
+    if objects_view(row[1:] for row in objects) != objects_view(row[1:] for row in kept.values()): 
+        names = sorted({row[1] for row in duplicate_objects})
+        raise RuntimeError(f'The Object Database {path} can not be upgraded: the objects {names} are listed more than once '
+                           f'with different details. Remove the extra rows so each name is listed once and restart.')
+
+    merged, conflicts = merge_rules(rules) if version < 1 else ([], [])
+    if conflicts: 
+        raise RuntimeError(f'The Object Database {path} can not be upgraded: the categories {conflicts} have more than one '
+                           f'rule with different allowed connections. Combine them into one rule per category and restart.')
+
+    if duplicate_objects or legacy: 
+        backup = f'{path}.v{version}.bak'
+        if not os.path.exists(backup): 
+            shutil.copy2(path, backup)
+
+    #sqlite only runs DDL inside a transaction if BEGIN is sent by hand, so the whole revision is applied or none of it is 
+    upgrade = create_engine(engine.url)
+
+    @event.listens_for(upgrade, 'connect')
+    def _connect(dbapi_connection, connection_record): 
+        dbapi_connection.isolation_level = None 
+
+    @event.listens_for(upgrade, 'begin')
+    def _begin(conn): 
+        conn.exec_driver_sql('BEGIN')
+
+    try: 
+        with upgrade.begin() as conn: 
+            if legacy: 
+                #legacy_alter_table stops the rename from pointing category_connections at the old table 
+                conn.exec_driver_sql('PRAGMA legacy_alter_table = ON')
+                conn.exec_driver_sql('DROP INDEX IF EXISTS ix_category_line_rules_category')
+                conn.exec_driver_sql('ALTER TABLE category_line_rules RENAME TO category_line_rules_legacy')
+                conn.exec_driver_sql('PRAGMA legacy_alter_table = OFF')
+            Base.metadata.create_all(conn)
+
+            for row in duplicate_objects: 
+                print(f"Warning: Removing duplicate object '{row[1]}' (id {row[0]}), the first row with that name is kept")
+                conn.execute(text('DELETE FROM objects WHERE object_id = :id'), {'id': row[0]})
+            conn.execute(text('CREATE UNIQUE INDEX IF NOT EXISTS ix_objects_name ON objects (name)'))
+
+            if legacy and version < 1: 
+                for rule_id, category, parts, double_connection in merged: 
+                    conn.execute(text('INSERT INTO category_line_rules (id, category, double_connection) VALUES (:id, :category, :double)'), 
+                                 {'id': rule_id, 'category': category, 'double': double_connection})
+                    for position, part in enumerate(parts): 
+                        conn.execute(text('INSERT INTO category_connections (rule_id, position, connection) VALUES (:rule_id, :position, :connection)'), 
+                                     {'rule_id': rule_id, 'position': position, 'connection': part})
+            elif legacy: 
+                #already upgraded by an earlier build that kept the column, category_connections is up to date 
+                conn.execute(text('INSERT INTO category_line_rules (id, category, double_connection) '
+                                  'SELECT id, category, double_connection FROM category_line_rules_legacy'))
+            if legacy: 
+                conn.exec_driver_sql('DROP TABLE category_line_rules_legacy')
+
+            conn.exec_driver_sql(f'PRAGMA user_version = {SCHEMA_VERSION}')
+    finally: 
+        upgrade.dispose()
 
 def get_db_path():
     app_data = os.path.join(os.environ.get('APPDATA', os.path.expanduser('~')), 'MJHInterface')
@@ -43,5 +201,9 @@ def get_db_path():
     return user_db
 
 engine = create_engine(f'sqlite:///{get_db_path()}', echo=False)
-Base.metadata.create_all(engine)
-Session = sessionmaker(bind=engine)
\ No newline at end of file
+Session = sessionmaker(bind=engine)
+
+def upgrade_database(): 
+    """Startup step, brings the user database up to SCHEMA_VERSION (see migrate) before anything reads it. 
+       Raises RuntimeError if the upgrade has to be refused, the database is then left as it was"""
+    migrate(engine)
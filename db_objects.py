@@ -1,4 +1,8 @@
-from database.db_models import Session, ObjectID, CategoryLineRule
+import hashlib
+import re
+from sqlalchemy import event
+from sqlalchemy.orm import Session as OrmSession, selectinload
+from database.db_models import Session, ObjectID, CategoryLineRule, CategoryConnection
 from backend.mathematical import Mathematical
 maths = Mathematical()
 
@@ -22,9 +26,9 @@ def get_category_catalogue():
     categories = []
     session = Session() 
     try:
-        all_categories = session.query(CategoryLineRule).all()
+        all_categories = session.query(CategoryLineRule).options(selectinload(CategoryLineRule.connections)).all()
         for cat in all_categories:
-            categories.append([cat.category, cat.allowed_connections, cat.double_connection ])
+            categories.append([cat.category, tuple(conn.connection for conn in cat.connections), cat.double_connection ])
         return categories
     
     except Exception as e:
@@ -33,52 +37,147 @@ def get_category_catalogue():
     finally:
         session.close()   
 
+class CatalogueCache: 
+    """The object catalogue and category rules loaded from the database once per process and shared by every lookup.
+       by_name holds the first catalogue row for each upper-cased name. Everything is dropped when ObjectID or 
+       CategoryLineRule rows are inserted, updated or deleted through SQLAlchemy (see the events below), clear() drops it by hand"""
+
+    def __init__(self): 
+        self.clear()
+
+    def clear(self): 
+        self._objects = None 
+        self._by_name = None 
+        self._categories = None 
+        self._rules = None 
+        self._verdicts = {}
+        self._insert_names = None 
+        self._line_names = None 
+        self._version = None 
+
+    def objects(self): 
+        if self._objects is None: 
+            self._objects = get_catalogue()
+        return self._objects
+
+    def by_name(self): 
+        if self._by_name is None: 
+            by_name = {}
+            for object in self.objects(): 
+                by_name.setdefault(object[0].upper(), object)
+            self._by_name = by_name 
+        return self._by_name
+
+    def insert_names(self): 
+        """on_channel_outline of the first catalogue row for each upper-cased name that a block can have"""
+        if self._insert_names is None: 
+            insert_names = {}
+            for name, type, category, on_channel_outline in self.objects(): 
+                if type not in ('LINE', 'LWPOLYLINE'):
+                    insert_names.setdefault(name.upper(), on_channel_outline)
+            self._insert_names = insert_names 
+        return self._insert_names
+
+    def line_names(self): 
+        """The catalogue rows a line can be, as (position of the first row for each upper-cased name, position of the first row 
+           on the channel outline ('Yes') and off it ('No'), number of rows), positions past the end mean there is no such row"""
+        if self._line_names is None: 
+            first = {}
+            first_on_channel = {}
+            count = 0 
+            for name, type, category, on_channel_outline in self.objects(): 
+                if type not in ('INSERT', 'LWPOLYLINE'):
+                    first.setdefault(name.upper(), count)
+                    first_on_channel.setdefault(on_channel_outline, count)
+                    count += 1 
+            self._line_names = (first, first_on_channel.get('Yes', count), first_on_channel.get('No', count), count)
+        return self._line_names
+
+    def categories(self): 
+        if self._categories is None: 
+            self._categories = get_category_catalogue()
+        return self._categories
+
+    def rules(self): 
+        """The category rules compiled by category, a list of (frozenset of allowed connections, double_connection) in table order"""
+        if self._rules is None: 
+            rules = {}
+            for cat, allowed_connections, double_connection in self.categories(): 
+                rules.setdefault(cat, []).append((frozenset(allowed_connections), double_connection))
+            self._rules = rules 
+        return self._rules
+
+    def verdict(self, line_category, line_start_category, line_end_category): 
+        """(safe_connections, untrue_quantity_connections) for a line, worked out once for each combination of categories"""
+        key = (line_category, line_start_category, line_end_category)
+        if key not in self._verdicts: 
+            self._verdicts[key] = connection_verdict(self.rules().get(line_category, ()), *key)
+        return self._verdicts[key]
+
+    def version(self): 
+        """Fingerprint of the object catalogue and category rules, changes whenever a row is added, removed or edited"""
+        if self._version is None: 
+            digest = hashlib.sha256()
+            for row in sorted(map(repr, self.objects())) + sorted(map(repr, self.categories())): 
+                digest.update(row.encode())
+            self._version = digest.hexdigest()
+        return self._version
+
+catalogue_cache = CatalogueCache()
+
+
+def _catalogue_changed(*args): 
+    catalogue_cache.clear()
+
+for model in (ObjectID, CategoryLineRule, CategoryConnection): 
+    for change in ('after_insert', 'after_update', 'after_delete'): 
+        event.listen(model, change, _catalogue_changed)
+
+@event.listens_for(OrmSession, 'after_bulk_update')
+@event.listens_for(OrmSession, 'after_bulk_delete')
+def _catalogue_bulk_changed(update_context): 
+    if update_context.mapper.class_ in (ObjectID, CategoryLineRule, CategoryConnection): 
+        catalogue_cache.clear()
+
+
+def catalogue_version(): 
+    """Fingerprint of the object catalogue and category rules, changes whenever a row is added, removed or edited"""
+    return catalogue_cache.version()
+
 # categories = get_category_catalogue() 
 # print(f'These are the categories {categories}')
 
        
 
 
-def name_match_block(blockrefs, lines, actual_type, wall_slopes, wall_intercepts, all_walls, line_refs): 
-    blocks = maths.Channel_check_block(wall_slopes, wall_intercepts, blockrefs)
+TRUSS_NUMBER = re.compile(r'\s*(\d+)(\s|$)')
+
+def is_truss_line(name): 
+    """Numbered truss lines ('NNN TRUSS LINE' with NNN from 100 to 999) are in the catalogue without being listed by name"""
+    upper = name.upper()
+    number = TRUSS_NUMBER.match(upper)
+    return 'TRUSS LINE' in upper and number is not None and 100 <= int(number.group(1)) <= 999
 
-    _, _, _, _, lines_cl = maths.Chanel_check_line(wall_slopes, wall_intercepts, lines, all_walls, line_refs)
-    objects = get_catalogue()
+
+def name_match_block(blockrefs, lines, actual_type, outline, line_refs): 
+    #only the check for the type being matched is needed 
+    if actual_type == 'INSERT': 
+        blocks = maths.Channel_check_block(outline, blockrefs)
+    if actual_type == 'LINE': 
+        _, _, _, _, lines_cl = maths.Chanel_check_line(outline, lines, line_refs)
     accepted_block_names = []
     rejected_block_names = []
     accepted_line_names = []
     rejected_line_names = []
 
-
-    # Build lookup lists from catalogue
-    valid_insert_names = []
-    valid_line_names = []
-
-
-    # print(f'Amount of objects {len(objects)}')
-
-    for object in objects:
-        name, type, category, on_channel_outline = object
-        if type not in ('LINE', 'LWPOLYLINE'):
-            valid_insert_names.append((name, on_channel_outline))
-        if type not in ('INSERT', 'LWPOLYLINE'):
-            valid_line_names.append((name, on_channel_outline))
-
-    
     if actual_type == 'INSERT':
+        insert_names = catalogue_cache.insert_names()
+
         for block in blocks:
             actual_name, x, y, _, on_channel = block
-            matched = False
-            channel_verification = False
-
-            for name, on_channel_outline in valid_insert_names:
-                if actual_name.upper() == name.upper():
-                    matched = True
-                    if on_channel == 'Yes' and on_channel_outline == 'Yes':
-                        channel_verification = True
-                    if on_channel == 'No' and on_channel_outline == 'No':
-                        channel_verification = True
-                    break
+            on_channel_outline = insert_names.get(actual_name.upper())
+            matched = actual_name.upper() in insert_names
+            channel_verification = matched and on_channel in ('Yes', 'No') and on_channel == on_channel_outline
 
             if matched and channel_verification:
                 accepted_block_names.append(actual_name)
@@ -92,27 +191,23 @@ def name_match_block(blockrefs, lines, actual_type, wall_slopes, wall_intercepts
         return accepted_block_names, rejected_block_names
 
     if actual_type == 'LINE':
+        #The catalogue rows are gone through in order until the line's name matches, numbered truss lines match the first row.
+        #The position is verified if any row up to and including the matching one (all rows if none match) has the same 
+        #on_channel_outline as the line
+        first, first_yes, first_no, count = catalogue_cache.line_names()
+
         for line in lines_cl:
             actual_l_name, x_s, y_s, x_e, y_e, on_channel = line
-            line_matched = False
-            channel_verified = False
+            line_matched = count > 0 and (actual_l_name.upper() in first or is_truss_line(actual_l_name))
 
-            for name, on_channel_outline in valid_line_names:
-                if actual_l_name.upper() == name.upper():
-                    line_matched = True
-                elif 'TRUSS LINE' in actual_l_name.upper():
-                    parts = actual_l_name.upper().split()
-                    if parts[0].isdigit() and 100 <= int(parts[0]) <= 999:
-                        line_matched = True
+            if not line_matched: 
+                last = count - 1
+            elif is_truss_line(actual_l_name): 
+                last = 0
+            else: 
+                last = first[actual_l_name.upper()]
 
-        
-                if on_channel == 'Yes' and on_channel_outline == 'Yes':
-                    channel_verified = True
-                if on_channel == 'No' and on_channel_outline == 'No':
-                    channel_verified = True
-
-                if line_matched: 
-                    break 
+            channel_verified = (on_channel == 'Yes' and first_yes <= last) or (on_channel == 'No' and first_no <= last)
 
             if line_matched and channel_verified:
                 accepted_line_names.append(actual_l_name)
@@ -124,11 +219,16 @@ def name_match_block(blockrefs, lines, actual_type, wall_slopes, wall_intercepts
         return accepted_line_names, rejected_line_names
     
 
-def before_after(fixed_all_blocks, blockrefs, lines, correct_lines, fixed_lines, wall_slopes, wall_intercepts, all_walls, line_refs):
-        
-    # correct_lines.extend(fixed_lines)
-    all_correct_lines = correct_lines + fixed_lines
+def name_match(blockrefs, lines, outline, line_refs): 
+    """Object Database check of one set of blocks and lines, the catalogue lookups are shared by both"""
+    accepted_blocks, rejected_blocks = name_match_block(blockrefs, lines, 'INSERT', outline, line_refs)
+    accepted_lines, rejected_lines = name_match_block(blockrefs, lines, 'LINE', outline, line_refs)
+    return accepted_blocks, rejected_blocks, accepted_lines, rejected_lines
 
+
+def before_correction(blockrefs, lines, outline, line_refs): 
+    """The Object Database check of the drawing as it was imported, before any corrections. 
+       Only worked out when asked for, to compare against the results after correction (see before_after)"""
     sort_blockrefs = []
     
     for block in blockrefs: #sorting blockrefs 
@@ -138,34 +238,14 @@ def before_after(fixed_all_blocks, blockrefs, lines, correct_lines, fixed_lines,
         else:
             sort_blockrefs.append([name, x, y, angle, name_error])    
 
-    #These are all the accepted blocks and lines before they are passed through the correction code 
-    initial_accepted_blocks, initial_rejected_blocks = name_match_block(sort_blockrefs, lines, 'INSERT', wall_slopes, wall_intercepts, all_walls, line_refs)
-    initial_accepted_line, initial_rejected_lines = name_match_block(sort_blockrefs, lines, 'LINE', wall_slopes, wall_intercepts, all_walls, line_refs)
-
-    #All accepted and rejected blocks post check, if an error arised here this is a big issue
-    post_accepted_block, post_rejected_block = name_match_block(fixed_all_blocks, all_correct_lines, 'INSERT', wall_slopes, wall_intercepts, all_walls, line_refs)
-    post_accepted_line, post_rejected_lines = name_match_block(fixed_all_blocks, all_correct_lines, 'LINE', wall_slopes, wall_intercepts, all_walls, line_refs)
-
-    # print(f'There are initially {len(initial_accepted_blocks)} Accepted Blocks and {len(initial_rejected_blocks)} Rejected Blocks from the object DataBase  ')
-    # for block in initial_rejected_blocks: 
-    #     name, x, y, rejection_reason = block 
-    #     print(f'Block: {(name), (x), (y)}: {rejection_reason}')
-
-    # print(f'There are initially {len(initial_accepted_line)} Accepted Lines and {len(initial_rejected_lines)} Rejected Lines from the object DataBase')
-    # for line in initial_rejected_lines: 
-    #     name, xs, ys, xe, ye, rejection_reason = line 
-    #     print(f'Line: {(name), (xs), (ys), (xe), (ye)}: {rejection_reason}')
+    return name_match(sort_blockrefs, lines, outline, line_refs)
 
-    # print(f'Post correction there are {len(post_accepted_block)} Accepted Blocks and {len(post_rejected_block)} Rejected Blocks from the obejct Database ')    
-    # for block in post_rejected_block: 
-    #     name, x, y, rejection_reason = block 
-    #     print(f'Block: {(name), (x), (y)}: {rejection_reason}')
 
-    # print(f'Post correction there are {len(post_accepted_line)} Accepted Lines and {len(post_rejected_lines)} Rejected Lines from the object Database')
-    # for line in post_rejected_lines: 
-    #     name, xs, ys, xe, ye, rejection_reason = line 
-    #     print(f'Line: {(name), (xs), (ys), (xe), (ye)}: {rejection_reason}')   
+def before_after(fixed_all_blocks, correct_lines, fixed_lines, outline, line_refs):
+    """All accepted and rejected blocks and lines after correction, if an error arises here this is a big issue"""
+    all_correct_lines = correct_lines + fixed_lines
 
+    post_accepted_block, post_rejected_block, post_accepted_line, post_rejected_lines = name_match(fixed_all_blocks, all_correct_lines, outline, line_refs)
 
     return post_accepted_block, post_accepted_line, post_rejected_block, post_rejected_lines 
 
@@ -187,25 +267,58 @@ def categories_sorter(line_connections):
     
 def get_category(line_name): 
     """Function that puts each line name into a category based on its name"""
-    objects = get_catalogue()
     if line_name is None: 
         return None 
-    for object in objects: 
+    object = catalogue_cache.by_name().get(line_name.upper())
+    if object is not None: 
         object_name, type, category, on_channel_outline = object 
-        if line_name.upper() == object_name.upper(): 
-            return category 
+        return category 
     
-    if 'TRUSS LINE' in line_name.upper():
-            parts = line_name.upper().split()
-            if parts[0].isdigit() and 100 <= int(parts[0]) <= 999:
-                return 'TRUSS LINE'
+    if is_truss_line(line_name): 
+        return 'TRUSS LINE'
                 
     return None 
 
 
-def validate_categories(line_line_connections, line_block_connections):
-    categories = get_category_catalogue() 
+def connection_verdict(rules, line_category, line_start_category, line_end_category): 
+    """Applies the rules for the line's category in table order, returns (safe_connections, untrue_quantity_connections)"""
+    safe_connections = False 
+    untrue_quantity_connections = False 
+
+    for allowed_list, double_connection in rules: 
+        if line_start_category in allowed_list and line_end_category in allowed_list:  
+            safe_connections = True 
+        
+        if line_category == 'TRUSS LINE': 
+            if line_start_category is None or line_end_category is None: 
+                safe_connections = True  
+            if line_start_category == 'TRUSS BRACING' or line_end_category == 'TRUSS BRACING': 
+                safe_connections = True 
+            if line_start_category == 'TRUSS BRACING' and line_end_category == 'TRUSS BRACING': 
+                safe_connections = False   
+
+        if line_category == 'SHS TRUSS LINE': 
+            if line_start_category is None or line_end_category is None: 
+                safe_connections = True          
+
+        if double_connection == 'Yes': 
+            if line_category == 'TRUSS LINE' or line_category == 'SHS TRUSS LINE': 
+                continue 
+            if line_start_category is None or line_end_category is None: 
+                untrue_quantity_connections = True 
+
+        if line_category == 'BRACE LINE':  #brace lines may fall short of studs 
+            if line_start_category == 'CP' and line_end_category is None:
+                safe_connections = True 
+                untrue_quantity_connections = False 
+            if line_end_category == 'CP' and line_start_category is None: 
+                safe_connections = True       
+                untrue_quantity_connections = False       
+
+    return safe_connections, untrue_quantity_connections
 
+
+def validate_categories(line_line_connections, line_block_connections):
     ll_connections = categories_sorter(line_line_connections)
     lb_connections = categories_sorter(line_block_connections)
     all_connections = ll_connections + lb_connections
@@ -218,47 +331,7 @@ def validate_categories(line_line_connections, line_block_connections):
 
     for line in all_connections: 
         line_name, line_category, line_start_category, line_end_category, x_start, y_start, x_end, y_end = line 
-        safe_connections = False 
-        untrue_quantity_connections = False 
-
-        for categor in categories: 
-            cat, allowed_connections, double_connection = categor
-
-            if allowed_connections:
-                allowed_list = [a.strip() for a in allowed_connections.split(',')]
-            else:
-                allowed_list = [] 
-
-            if cat == line_category: 
-                if line_start_category in allowed_list and line_end_category in allowed_list:  
-                    safe_connections = True 
-                
-                if line_category == 'TRUSS LINE': 
-                    if line_start_category is None or line_end_category is None: 
-                        safe_connections = True  
-                    if line_start_category == 'TRUSS BRACING' or line_end_category == 'TRUSS BRACING': 
-                        safe_connections = True 
-                    if line_start_category == 'TRUSS BRACING' and line_end_category == 'TRUSS BRACING': 
-                        safe_connections = False   
-
-                if line_category == 'SHS TRUSS LINE': 
-                    if line_start_category is None or line_end_category is None: 
-                        safe_connections = True          
-
-                if double_connection == 'Yes': 
-                    if line_category == 'TRUSS LINE' or line_category == 'SHS TRUSS LINE': 
-                        continue 
-                    if line_start_category is None or line_end_category is None: 
-                        untrue_quantity_connections = True 
-
-                if cat == 'BRACE LINE':  #brace lines may fall short of studs 
-                    if line_start_category == 'CP' and line_end_category is None:
-                        safe_connections = True 
-                        untrue_quantity_connections = False 
-                    if line_end_category == 'CP' and line_start_category is None: 
-                        safe_connections = True       
-                        untrue_quantity_connections = False       
-       
+        safe_connections, untrue_quantity_connections = catalogue_cache.verdict(line_category, line_start_category, line_end_category)
 
         if safe_connections and not untrue_quantity_connections: 
             correct_connections_cat.append([line_name])  
@@ -1,5 +1,5 @@
 
-from database.db_models import Session, ObjectID, CategoryLineRule
+from database.db_models import Session, ObjectID, CategoryLineRule, upgrade_database
 
 #if there is a line mistake it won't fail due to this database if it meets all criteria, however it will fail due to the category database
 
@@ -148,12 +148,9 @@ def seed_category_line_rules():
 
         rules = []
         for item in category_line_data:
-            conn = item['allowed_connections']
-            if isinstance(conn, tuple):
-                conn = ','.join(conn)
             rules.append(CategoryLineRule(
                 category=item['category'],
-                allowed_connections=conn,
+                allowed_connections=item['allowed_connections'],  #stored one row per connection in category_connections
                 double_connection=item['double_connection']
             ))
 
@@ -171,6 +168,7 @@ def seed_category_line_rules():
 
 
 if __name__ == '__main__':
+    upgrade_database()
     seed_database()
     seed_category_line_rules() 
 
@@ -2,7 +2,7 @@ import sys
 from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtGui import QFont, QPixmap 
 from PyQt5.QtCore import Qt 
-from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QGridLayout, QTableWidget, QLabel, QSizePolicy, QHeaderView, QMessageBox, QFileDialog, QTableWidgetItem, QPushButton, QHBoxLayout, QTabWidget
+from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QGridLayout, QTableWidget, QLabel, QSizePolicy, QHeaderView, QMessageBox, QFileDialog, QTableWidgetItem, QPushButton, QHBoxLayout, QTabWidget, QCheckBox
 from backend.autocorrect import *
 from gui.base_table import BaseTable
 from utils import resource_path
@@ -15,11 +15,16 @@ class MyWindow(QMainWindow):
             self.setGeometry(0, 0, 1920, 1000)
             self.setWindowTitle('MJHInterface')
             self.original_filepath = None   
+            self.streaming = False 
+            self.session = None 
+            self.result = None 
+            self.database_tab = None 
             self.initUI()
 
     def initUI(self):
         self.tabs = QTabWidget()
         self.setCentralWidget(self.tabs)
+        self.tabs.currentChanged.connect(self.tab_changed)
 
         self.tab1 = QWidget()
         self.tab1_grid = QGridLayout()
@@ -56,6 +61,9 @@ class MyWindow(QMainWindow):
 
         hbox2 = QHBoxLayout()
         self.Button3 = self.create_buttons('Reset App', self.reset_app, hbox2, "QPushButton {background-color: #0000FF; color: white;} QPushButton:hover{background-color: #00008B;}")
+        self.low_memory_box = QCheckBox('Low Memory Mode (very large files)') #streams the file instead of loading it all into memory 
+        self.low_memory_box.setFont(QFont('Inter', 10))
+        hbox2.addWidget(self.low_memory_box)
         vbox_t.addLayout(hbox2)
 
         self.tab1_grid.addLayout(vbox_t, 2, 0, 1, 3)
@@ -150,37 +158,37 @@ class MyWindow(QMainWindow):
         line_headers = ['Name', 'x start', 'y start', 'x end', 'y end']
 
         # print(f'These are the mistake points {self.mistake_points}')
-        if self.bed_check == 1: 
-            if len(self.bedit_mistake_points) > 0: 
+        if self.result.bedit_check == 1: 
+            if len(self.result.bedit_mistake_points) > 0: 
                 vbox1 = LabeledTableWidget('Insert Block Reference Errors Located at Points:',block_ref_headers,BaseTable.RED)
                 vbox2 = LabeledTableWidget('Block Reference Errors Fixed to Points:',block_ref_headers, BaseTable.GREEN)
                 self.table5 = vbox1.table
                 self.table6 = vbox2.table
                 grid.addLayout(vbox1, 0, 0, 1, 1)
                 grid.addLayout(vbox2, 0, 1, 1, 1)
-                self.table5.populate(self.bedit_mistake_points)
-                self.table6.populate(self.bedit_corrected_blocks)
+                self.table5.populate(self.result.bedit_mistake_points)
+                self.table6.populate(self.result.bedit_corrected_blocks)
 
         else:
-            if len(self.mistake_points) > 0: 
+            if len(self.result.mistake_points) > 0: 
                 vbox1 = LabeledTableWidget('Insert Block Reference Errors Located at Points:',block_ref_headers,BaseTable.RED)
                 vbox2 = LabeledTableWidget('Block Reference Errors Fixed to Points:',block_ref_headers, BaseTable.GREEN)
                 self.table5 = vbox1.table
                 self.table6 = vbox2.table
                 grid.addLayout(vbox1, 0, 0, 1, 1)
                 grid.addLayout(vbox2, 0, 1, 1, 1)
-                self.table5.populate(self.mistake_points)
-                self.table6.populate(self.corrected_blocks)
+                self.table5.populate(self.result.mistake_points)
+                self.table6.populate(self.result.corrected_blocks)
        
-        if len(self.line_mistakes) > 0: 
+        if len(self.result.line_mistakes) > 0: 
             vbox3 = LabeledTableWidget('Insert Line Errors Located at Points: ',line_headers, BaseTable.RED)
             vbox4 = LabeledTableWidget('Line Insert Errors fixed to Points:',line_headers, BaseTable.GREEN)
             self.table7 = vbox3.table
             self.table8 = vbox4.table
             grid.addLayout(vbox3, 1, 0, 1, 1)
             grid.addLayout(vbox4, 1, 1, 1, 1)
-            self.table7.populate(self.line_mistakes)
-            self.table8.populate(self.fixed_lines)
+            self.table7.populate(self.result.line_mistakes)
+            self.table8.populate(self.result.fixed_lines)
 
     
         tab3.setLayout(grid)
@@ -188,7 +196,6 @@ class MyWindow(QMainWindow):
    
 
     def database_results(self): 
-        tab4 = QWidget() 
         grid = QGridLayout() 
 
         vbox1 = QVBoxLayout() 
@@ -198,7 +205,7 @@ class MyWindow(QMainWindow):
 
         tables_hbox1 = QHBoxLayout() 
 
-        if len(self.post_rejected_blocks) > 0: 
+        if len(self.result.post_rejected_blocks) > 0: 
             titlelabel1 = QLabel('Object Database') 
             titlelabel1.setAlignment(Qt.AlignCenter)
             titlelabel1.setFont(QFont('Inter', 14, QFont.Bold))
@@ -211,7 +218,7 @@ class MyWindow(QMainWindow):
             vbox1.addWidget(subtitlelabel1)
     
             left_vbox = QVBoxLayout()
-            left_label = QLabel(f"There was {len(self.post_rejected_blocks)} Rejected Block(s) {self.cross} from the Object Database ")
+            left_label = QLabel(f"There was {len(self.result.post_rejected_blocks)} Rejected Block(s) {self.cross} from the Object Database ")
             left_label.setFont(QFont('Inter', 10))
             left_vbox.addWidget(left_label)
 
@@ -220,11 +227,11 @@ class MyWindow(QMainWindow):
             self.table9 = left_vbox_internal.table
             left_vbox.addLayout(left_vbox_internal)
             tables_hbox1.addLayout(left_vbox)
-            self.table9.populate(self.post_rejected_blocks)
+            self.table9.populate(self.result.post_rejected_blocks)
 
-        if len(self.post_rejected_lines) > 0:    
+        if len(self.result.post_rejected_lines) > 0:    
             right_vbox = QVBoxLayout() 
-            right_label = QLabel(f'There was {len(self.post_rejected_lines)} Rejected Line(s) {self.cross} from the Object Database')    
+            right_label = QLabel(f'There was {len(self.result.post_rejected_lines)} Rejected Line(s) {self.cross} from the Object Database')    
             right_label.setFont(QFont('Inter', 10))
             right_vbox.addWidget(right_label)
     
@@ -232,13 +239,13 @@ class MyWindow(QMainWindow):
             right_vbox_internal = LabeledTableWidget('Unexpected Lines:', line_headers, BaseTable.RED)
             self.table10 = right_vbox_internal.table
             right_vbox.addLayout(right_vbox_internal)
-            self.table10.populate(self.post_rejected_lines)
+            self.table10.populate(self.result.post_rejected_lines)
             tables_hbox1.addLayout(right_vbox)
 
         vbox1.addLayout(tables_hbox1)
 
         #Category Database 
-        if len(self.all_fail) > 0:
+        if len(self.result.all_fail) > 0:
             titlelabel2 = QLabel('Category Database')
             titlelabel2.setAlignment(Qt.AlignCenter)
             titlelabel2.setFont(QFont('Inter', 14, QFont.Bold))
@@ -247,7 +254,7 @@ class MyWindow(QMainWindow):
             subtitlelabel2.setAlignment(Qt.AlignCenter)
             subtitlelabel2.setFont(QFont('Inter', 10))
 
-            main_label = QLabel(f'There are {len(self.line_name)} Accepted Lines {self.check} and {len(self.all_fail)} Rejected Line(s) {self.cross} by the Category Database.')
+            main_label = QLabel(f'There are {len(self.result.line_name)} Accepted Lines {self.check} and {len(self.result.all_fail)} Rejected Line(s) {self.cross} by the Category Database.')
             main_label.setFont(QFont('Inter', 10))
             vbox2.addWidget(titlelabel2)
             vbox2.addWidget(subtitlelabel2)
@@ -257,15 +264,26 @@ class MyWindow(QMainWindow):
             vbox_internal = LabeledTableWidget('Failed Lines', category_headers, BaseTable.RED)
             self.table11 = vbox_internal.table
             vbox2.addLayout(vbox_internal)
-            self.table11.populate(self.all_fail)
+            self.table11.populate(self.result.all_fail)
 
         # Add the vbox into the grid
         grid.addLayout(vbox1, 0, 0)
         grid.addLayout(vbox2, 1, 0)
 
-        tab4.setLayout(grid)
+        if len(self.result.post_rejected_blocks) < 1 and len(self.result.post_rejected_lines) < 1 and len(self.result.all_fail) < 1: 
+            accepted_label = QLabel(f'All objects were accepted by the Object and Category Databases {self.check}')
+            accepted_label.setAlignment(Qt.AlignCenter)
+            accepted_label.setFont(QFont('Inter', 12))
+            vbox1.addWidget(accepted_label)
 
-        self.tabs.addTab(tab4, "Database Results")
+        self.database_tab.setLayout(grid)
+
+    def tab_changed(self, index): 
+        #The database checks run the first time the Database Results tab is opened 
+        if self.database_tab is None or self.tabs.widget(index) is not self.database_tab or self.database_tab.layout() is not None: 
+            return 
+        self.database_results()
+        self.database_summary()
 
 
     check = "\u2705"      # ✅
@@ -283,9 +301,6 @@ class MyWindow(QMainWindow):
         vboxgeo1 = QVBoxLayout() 
         vboxgeo2 = QVBoxLayout() 
         hboxgeo1 = QHBoxLayout()
-        hboxdata = QHBoxLayout() 
-        vboxdata1 = QVBoxLayout() 
-        vboxdata2 = QVBoxLayout() 
 
         QMLabel = QLabel('Results Summary')
         QMLabel.setAlignment(Qt.AlignCenter)
@@ -295,7 +310,7 @@ class MyWindow(QMainWindow):
         QtitLabel.setAlignment(Qt.AlignCenter)
         QtitLabel.setFont(QFont('Inter', 12, QFont.Bold))
 
-        if self.bed_check == 1: ### if all blocks are inside a module 
+        if self.result.bedit_check == 1: ### if all blocks are inside a module 
 
             Qbeditlabel = QLabel(f'{self.warning} All contents in the Module are inside a single Block Reference, Error has been fixed {self.warning}')
             Qbeditlabel.setAlignment(Qt.AlignCenter)
@@ -303,60 +318,60 @@ class MyWindow(QMainWindow):
             Qbeditlabel.setStyleSheet('color: red;')
             vbox1.addWidget(Qbeditlabel)
 
-            if len(self.bedit_mistake_points) > 0: 
-                QLabel1 = QLabel(f'There were {len(self.on_line_points) - len(self.bedit_mistake_points)} Block(s) Accepted {self.check} and {len(self.bedit_mistake_points)} Block(s) Rejected {self.cross} by the Geometry Engine')
+            if len(self.result.bedit_mistake_points) > 0: 
+                QLabel1 = QLabel(f'There were {len(self.result.on_line_points) - len(self.result.bedit_mistake_points)} Block(s) Accepted {self.check} and {len(self.result.bedit_mistake_points)} Block(s) Rejected {self.cross} by the Geometry Engine')
                 QLabel1.setAlignment(Qt.AlignCenter)
                 QLabel1.setFont(QFont('Inter', 10))
                 vboxgeo1.addWidget(QLabel1)
 
-                if len(self.bedit_mistake_points) == 1: #Getting the language correct 
-                    QLabel2 = QLabel(f'{len(self.bedit_corrected_blocks)} Block was corrected {self.warning} by the Geometry Engine')
+                if len(self.result.bedit_mistake_points) == 1: #Getting the language correct 
+                    QLabel2 = QLabel(f'{len(self.result.bedit_corrected_blocks)} Block was corrected {self.warning} by the Geometry Engine')
                 else:
-                    QLabel2 = QLabel(f'{len(self.bedit_corrected_blocks)} Blocks were corrected {self.warning} by the Geometry Engine')
+                    QLabel2 = QLabel(f'{len(self.result.bedit_corrected_blocks)} Blocks were corrected {self.warning} by the Geometry Engine')
 
                 QLabel2.setAlignment(Qt.AlignCenter)
                 QLabel2.setFont(QFont('Inter', 10))
                 vboxgeo1.addWidget(QLabel2)
 
-            if len(self.bedit_mistake_points) < 1: 
-                QLabel1 = QLabel(f'All {len(self.on_line_points)} Blocks were accepted by the Geometry Engine {self.check}')
+            if len(self.result.bedit_mistake_points) < 1: 
+                QLabel1 = QLabel(f'All {len(self.result.on_line_points)} Blocks were accepted by the Geometry Engine {self.check}')
                 QLabel1.setAlignment(Qt.AlignCenter)
                 QLabel1.setFont(QFont('Inter', 10))
                 vboxgeo1.addWidget(QLabel1)
 
         else: # if the file is normal 
-            if len(self.mistake_points) > 0: 
-                QLabel1 = QLabel(f'There were {len(self.on_line_points) - len(self.mistake_points)} Block(s) Accepted {self.check} and {len(self.mistake_points)} Block(s) Rejected {self.cross} by the Geometry Engine')
+            if len(self.result.mistake_points) > 0: 
+                QLabel1 = QLabel(f'There were {len(self.result.on_line_points) - len(self.result.mistake_points)} Block(s) Accepted {self.check} and {len(self.result.mistake_points)} Block(s) Rejected {self.cross} by the Geometry Engine')
                 QLabel1.setAlignment(Qt.AlignCenter)
                 QLabel1.setFont(QFont('Inter', 10))
 
-                if len(self.mistake_points) == 1: #Getting the language correct 
-                    QLabel2 = QLabel(f'{len(self.corrected_blocks)} Block was corrected {self.warning} by the Geometry Engine')
+                if len(self.result.mistake_points) == 1: #Getting the language correct 
+                    QLabel2 = QLabel(f'{len(self.result.corrected_blocks)} Block was corrected {self.warning} by the Geometry Engine')
                 else:
-                    QLabel2 = QLabel(f'{len(self.corrected_blocks)} Blocks were corrected {self.warning} by the Geometry Engine')
+                    QLabel2 = QLabel(f'{len(self.result.corrected_blocks)} Blocks were corrected {self.warning} by the Geometry Engine')
 
                 QLabel2.setAlignment(Qt.AlignCenter)
                 QLabel2.setFont(QFont('Inter', 10))
                 vboxgeo1.addWidget(QLabel1)
                 vboxgeo1.addWidget(QLabel2)
 
-            if len(self.mistake_points) < 1: 
-                QLabel1 = QLabel(f'All {len(self.on_line_points)} Blocks were accepted by the Geometry Engine {self.check}')
+            if len(self.result.mistake_points) < 1: 
+                QLabel1 = QLabel(f'All {len(self.result.on_line_points)} Blocks were accepted by the Geometry Engine {self.check}')
                 QLabel1.setAlignment(Qt.AlignCenter)
                 QLabel1.setFont(QFont('Inter', 10))
                 vboxgeo1.addWidget(QLabel1)
 
             ####
 
-        if len(self.line_mistakes) > 0: 
-            QLabel3 = QLabel(f'There were {len(self.all_lines_table) - len(self.line_mistakes)} Line(s) Accepted {self.check} and {len(self.line_mistakes)} Line(s) Rejected {self.cross} by the Geometry Engine')
+        if len(self.result.line_mistakes) > 0: 
+            QLabel3 = QLabel(f'There were {len(self.result.all_lines_table) - len(self.result.line_mistakes)} Line(s) Accepted {self.check} and {len(self.result.line_mistakes)} Line(s) Rejected {self.cross} by the Geometry Engine')
             QLabel3.setAlignment(Qt.AlignCenter)
             QLabel3.setFont(QFont('Inter', 10))
 
-            if len(self.line_mistakes) == 1: 
-                QLabel4 = QLabel(f'{len(self.fixed_lines)} Line was corrected {self.warning} by the Geometry Engine')
+            if len(self.result.line_mistakes) == 1: 
+                QLabel4 = QLabel(f'{len(self.result.fixed_lines)} Line was corrected {self.warning} by the Geometry Engine')
             else:     
-                QLabel4 = QLabel(f'{len(self.fixed_lines)} Lines were corrected {self.warning} by the Geometry Engine')
+                QLabel4 = QLabel(f'{len(self.result.fixed_lines)} Lines were corrected {self.warning} by the Geometry Engine')
 
             QLabel4.setAlignment(Qt.AlignCenter)
             QLabel4.setFont(QFont('Inter', 10))
@@ -364,8 +379,8 @@ class MyWindow(QMainWindow):
             vboxgeo2.addWidget(QLabel3)
             vboxgeo2.addWidget(QLabel4)
 
-        if len(self.line_mistakes) < 1: 
-            QLabel3 = QLabel(f'All {len(self.all_lines_table)} Lines were accepted by the Geometry Engine {self.check}')   
+        if len(self.result.line_mistakes) < 1: 
+            QLabel3 = QLabel(f'All {len(self.result.all_lines_table)} Lines were accepted by the Geometry Engine {self.check}')   
             QLabel3.setAlignment(Qt.AlignCenter)
             QLabel3.setFont(QFont('Inter', 10))
             vboxgeo2.addWidget(QLabel3)
@@ -379,7 +394,7 @@ class MyWindow(QMainWindow):
 
         vbox1.addLayout(hboxgeo1)
 
-        if len(self.corrected_blocks) > 0 or len(self.fixed_lines) > 0: 
+        if len(self.result.corrected_blocks) > 0 or len(self.result.fixed_lines) > 0: 
             QLabelerr = QLabel(f'{self.warning}See Error Fixation Tab for more details {self.warning}') 
             QLabelerr.setAlignment(Qt.AlignCenter)  # ← you had QLabel3 here by mistake
             QLabelerr.setFont(QFont('Inter', 10))
@@ -392,34 +407,87 @@ class MyWindow(QMainWindow):
         QtitLabel2.setFont(QFont('Inter', 12, QFont.Bold))
         vbox2.addWidget(QtitLabel2)
 
+        #filled in by database_summary once the Database Results tab has been opened 
+        self.database_pending = QLabel('Open the Database Results tab to run the Object and Category Database checks')
+        self.database_pending.setAlignment(Qt.AlignCenter)
+        self.database_pending.setFont(QFont('Inter', 10))
+        vbox2.addWidget(self.database_pending)
+        self.summary_database_box = vbox2
+
+        container_geo = QWidget()
+        container_geo.setObjectName("summary_container")
+        container_geo.setStyleSheet("#summary_container { border: 1px solid black; border-radius: 5px; }")
+
+        container_cat = QWidget()
+        container_cat.setObjectName("summary_container")
+        container_cat.setStyleSheet("#summary_container { border: 1px solid black; border-radius: 5px; }")
+
+        container2 = QWidget()
+        container2.setObjectName("summary_container")
+        container2.setStyleSheet("#summary_container { border: 1px solid black; border-radius: 5px; }")
+      
+
+        container_geo.setLayout(vbox1)
+        container_cat.setLayout(vbox2)    
+        godvbox2.addLayout(vbox1)
+        godvbox2.addLayout(vbox2)
+
+        #setting the boxses
+        container2.setLayout(godvbox2)
+
+        godvbox2.addWidget(container_geo)
+        godvbox2.addWidget(container_cat)
+
+
+        grid.addLayout(godvbox1, 0, 0)  
+        grid.addWidget(container2, 1, 0)
+        # grid.addLayout(godvbox2, 1, 0)
+        tab5.setLayout(grid)
+        # self.tabs.addTab(tab5, "Results Summary")
+
+        # Clear any previous layout on the container
+        if self.summary_container.layout():
+            QWidget().setLayout(self.summary_container.layout())
+
+        self.summary_container.setLayout(godvbox2)
+        self.summary_container.setVisible(True)  
+
+    def database_summary(self): 
+        #Database part of the results summary, swaps the placeholder for the Object and Category Database results
+        vbox2 = self.summary_database_box
+        hboxdata = QHBoxLayout() 
+        vboxdata1 = QVBoxLayout() 
+        vboxdata2 = QVBoxLayout() 
+
+        self.database_pending.setVisible(False)
+
         QtitLabel3 = QLabel('Object DataBase')
         QtitLabel3.setAlignment(Qt.AlignCenter)
         QtitLabel3.setFont(QFont('Inter', 11, QFont.Bold))
         vboxdata1.addWidget(QtitLabel3)
 
-        if (len(self.post_rejected_blocks)) > 0: 
-            QLabel5 = QLabel(f'There were {len(self.post_accepted_blocks)} Block(s) Accepted {self.check} and {len(self.post_rejected_blocks)} Block(s) Rejected {self.cross} by the Object Database')
+        if (len(self.result.post_rejected_blocks)) > 0: 
+            QLabel5 = QLabel(f'There were {len(self.result.post_accepted_blocks)} Block(s) Accepted {self.check} and {len(self.result.post_rejected_blocks)} Block(s) Rejected {self.cross} by the Object Database')
         else:     
-            QLabel5 = QLabel(f'All {len(self.post_accepted_blocks)} Blocks were accepted by the Object Database {self.check}')  
+            QLabel5 = QLabel(f'All {len(self.result.post_accepted_blocks)} Blocks were accepted by the Object Database {self.check}')  
 
         QLabel5.setAlignment(Qt.AlignCenter)
         QLabel5.setFont(QFont('Inter', 10))
         vboxdata1.addWidget(QLabel5)
 
 
-        if len(self.post_rejected_lines) > 0: 
-            QLabel6 = QLabel(f'There were {len(self.post_accepted_lines)} Line(s) Accepted {self.check} and {len(self.post_rejected_lines)} Line(s) Rejected {self.cross} by the Object Database ')  
+        if len(self.result.post_rejected_lines) > 0: 
+            QLabel6 = QLabel(f'There were {len(self.result.post_accepted_lines)} Line(s) Accepted {self.check} and {len(self.result.post_rejected_lines)} Line(s) Rejected {self.cross} by the Object Database ')  
             vboxdata1.addWidget(QLabel6)
 
         else: 
-            QLabel6 = QLabel(f'All {len(self.post_accepted_lines)} Lines were accepted by the Object Database {self.check} ')    
+            QLabel6 = QLabel(f'All {len(self.result.post_accepted_lines)} Lines were accepted by the Object Database {self.check} ')    
 
         QLabel6.setAlignment(Qt.AlignCenter)
         QLabel6.setFont(QFont('Inter', 10))
         vboxdata1.addWidget(QLabel6)
 
         hboxdata.addLayout(vboxdata1)    
-        vbox2.addLayout(hboxdata)
 
         #Category database 
 
@@ -428,72 +496,37 @@ class MyWindow(QMainWindow):
         QtitLabel4.setFont(QFont('Inter', 11, QFont.Bold))
         vboxdata2.addWidget(QtitLabel4)
 
-        if len(self.all_fail) > 0: 
-            QLabel7 = QLabel(f'There were {len(self.line_name)} Accepted Line(s) {self.check} and {len(self.all_fail)} Rejected Line(s) {self.cross} from the Category Database ')
+        if len(self.result.all_fail) > 0: 
+            QLabel7 = QLabel(f'There were {len(self.result.line_name)} Accepted Line(s) {self.check} and {len(self.result.all_fail)} Rejected Line(s) {self.cross} from the Category Database ')
         else: 
-            QLabel7 = QLabel(f'All {len(self.line_name)} were accepted by the Category Database {self.check}')
+            QLabel7 = QLabel(f'All {len(self.result.line_name)} were accepted by the Category Database {self.check}')
 
         QLabel7.setAlignment(Qt.AlignCenter)
         QLabel7.setFont(QFont('Inter', 10))
         vboxdata2.addWidget(QLabel7)
     
-        if len(self.all_fail) > 0 or len(self.post_rejected_lines) > 0 or len(self.post_rejected_blocks) > 0: 
+        if len(self.result.all_fail) > 0 or len(self.result.post_rejected_lines) > 0 or len(self.result.post_rejected_blocks) > 0: 
             dataerror2 = QLabel(f'{self.warning}See Database Results Tab for more details {self.warning}')
             dataerror2.setAlignment(Qt.AlignCenter)
             dataerror2.setFont(QFont('Inter', 10))
             vbox2.addWidget(dataerror2)
        
         hboxdata.addLayout(vboxdata2)
-        vbox2.addLayout(hboxdata)   
-
-        container_geo = QWidget()
-        container_geo.setObjectName("summary_container")
-        container_geo.setStyleSheet("#summary_container { border: 1px solid black; border-radius: 5px; }")
-
-        container_cat = QWidget()
-        container_cat.setObjectName("summary_container")
-        container_cat.setStyleSheet("#summary_container { border: 1px solid black; border-radius: 5px; }")
-
-        container2 = QWidget()
-        container2.setObjectName("summary_container")
-        container2.setStyleSheet("#summary_container { border: 1px solid black; border-radius: 5px; }")
-      
-
-        container_geo.setLayout(vbox1)
-        container_cat.setLayout(vbox2)    
-        godvbox2.addLayout(vbox1)
-        godvbox2.addLayout(vbox2)
-
-        #setting the boxses
-        container2.setLayout(godvbox2)
-
-        godvbox2.addWidget(container_geo)
-        godvbox2.addWidget(container_cat)
-
-
-        grid.addLayout(godvbox1, 0, 0)  
-        grid.addWidget(container2, 1, 0)
-        # grid.addLayout(godvbox2, 1, 0)
-        tab5.setLayout(grid)
-        # self.tabs.addTab(tab5, "Results Summary")
-
-        # Clear any previous layout on the container
-        if self.summary_container.layout():
-            QWidget().setLayout(self.summary_container.layout())
-
-        self.summary_container.setLayout(godvbox2)
-        self.summary_container.setVisible(True)  
+        vbox2.addLayout(hboxdata)
 
     def populate_results_table(self): 
         #populate the results table  
-        self.table1.populate(self.on_line_points)
-        self.table2.populate(self.wall_slope_intercept)
-        self.table3.populate(self.all_lines_table)
-        self.table4.populate(self.filtered_walls)      
+        self.table1.populate(self.result.on_line_points)
+        self.table2.populate(self.result.wall_slope_intercept)
+        self.table3.populate(self.result.all_lines_table)
+        self.table4.populate(self.result.filtered_walls)      
    
     def import_dxf_file(self):
 
         self.original_filepath = None
+        self.session = None 
+        self.result = None 
+        self.database_tab = None 
         
         while self.tabs.count() > 1:
             self.tabs.removeTab(1)
@@ -503,9 +536,10 @@ class MyWindow(QMainWindow):
 
         if filepath:
             self.original_filepath = filepath
-            result = autocad_points(filepath)
+            self.streaming = self.low_memory_box.isChecked()
+            self.session = analyse_file(filepath, self.streaming)
 
-            if result is None:
+            if self.session is None:
                 QMessageBox.warning(None, "Invalid File", "The selected file is missing lines, blocks, or a channel outline. Please check the file and try again.")
                 self.original_filepath = None
                 return
@@ -513,30 +547,31 @@ class MyWindow(QMainWindow):
             import os
             self.status_label.setText(f'Current File: {os.path.basename(filepath)}\nApp State: File Loaded ✅')
 
-            (_, self.on_line_points,
-            self.all_lines_table, self.wall_slope_intercept,
-            self.filtered_walls, self.mistake_points,
-            self.corrected_blocks, self.line_mistakes,
-            self.bedit_lines, _, _, _, _, self.line_duplicate_points,
-            self.post_accepted_blocks, self.post_accepted_lines,
-            self.post_rejected_blocks, self.post_rejected_lines,
-            self.line_name, self.all_fail, self.blocks_fil, self.bed_check, 
-            self.fixed_lines, self.fixed_line_refs, self.all_walls, self.wall_point_refs, self.bedit_mistake_points, 
-            self.bedit_corrected_blocks) = result
+            self.result = self.session.result
 
             self.create_results_tab()
 
-            if len(self.mistake_points) > 0 or len(self.line_mistakes) > 0: 
+            if len(self.result.mistake_points) > 0 or len(self.result.line_mistakes) > 0: 
                 self.results_fixation()
-            if len(self.post_rejected_blocks) > 0 or len(self.post_rejected_lines) or len(self.all_fail) > 0:  
-                self.database_results()
-            self.results_summary() 
+
+            #Database checks are only run once the Database Results tab is opened (see tab_changed), so the tab is always there 
+            #until they have run. When they came with the result (analysis cache) the tab is only added if something was rejected
+            self.database_tab = QWidget()
+            if self.result.worked_out('database', 'categories'): 
+                if len(self.result.post_rejected_blocks) > 0 or len(self.result.post_rejected_lines) or len(self.result.all_fail) > 0:  
+                    self.database_results()
+                    self.tabs.addTab(self.database_tab, "Database Results")
+                self.results_summary() 
+                self.database_summary()
+            else: 
+                self.tabs.addTab(self.database_tab, "Database Results")
+                self.results_summary() 
             QMessageBox.information(None, "Success", f"File loaded:\n{filepath}")
 
         return filepath      
 
     def fix_errors(self):
-        if not self.original_filepath: 
+        if not self.original_filepath or self.session is None: 
             QMessageBox.warning(None, "Error", "Please import a file first!")
             return
         
@@ -550,7 +585,7 @@ class MyWindow(QMainWindow):
         if output_filepath:
             try:
                 # NEW FUNCTION - modifies file in place
-                update_dxf_in_place(self.original_filepath, output_filepath)
+                update_dxf_in_place(self.session, output_filepath)
                 QMessageBox.information(None, "Success", f"Corrections applied and saved to:\n{output_filepath}")
                 
             except Exception as e:
@@ -558,6 +593,9 @@ class MyWindow(QMainWindow):
 
     def reset_app(self):
         self.original_filepath = None
+        self.session = None 
+        self.result = None 
+        self.database_tab = None 
         
         while self.tabs.count() > 1:
             self.tabs.removeTab(1)
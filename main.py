@@ -1,10 +1,16 @@
 import sys
 import os   
-from PyQt5.QtWidgets import QApplication
+from PyQt5.QtWidgets import QApplication, QMessageBox
 from gui.runinterface import MyWindow
+from database.db_models import upgrade_database
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
+    try:
+        upgrade_database()
+    except Exception as e:
+        QMessageBox.critical(None, "Error", f"Failed to open the Object Database:\n{str(e)}")
+        sys.exit(1)
     win = MyWindow()
     win.show()
     sys.exit(app.exec_())
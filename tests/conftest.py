@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+#the database module opens the user database when it is imported, the tests get their own app-data folder 
+os.environ['APPDATA'] = tempfile.mkdtemp(prefix='mjh_tests_')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from database.db_models import upgrade_database  #the startup step main.py runs before the window opens 
+upgrade_database()
@@ -0,0 +1,66 @@
+import ezdxf
+import pytest
+import db_seed
+from backend import autocorrect
+from database.db_models import Session, ObjectID
+
+
+@pytest.fixture
+def drawing(tmp_path):
+    db_seed.seed_database()
+    db_seed.seed_category_line_rules()
+
+    doc = ezdxf.new()
+    msp = doc.modelspace()
+    for name in ('NLB 30 CENTRE', 'CPSHS150X50X8'):
+        doc.blocks.new(name).add_line((0, 0), (1, 1))
+    msp.add_lwpolyline([(1000, 1000), (9000, 1000), (9000, 6000), (1000, 6000)], close=True, dxfattribs={'layer': 'CHANNEL OUTLINE'})
+    for x in (2000, 3000.5, 4000, 5000):
+        msp.add_line((x, 1000), (x, 6000), dxfattribs={'layer': '535 TRUSS LINE'})
+        msp.add_blockref('NLB 30 CENTRE', (x, 1000))
+        msp.add_blockref('CPSHS150X50X8', (x + 0.5, 6003))
+    msp.add_line((2000, 3000), (4000, 3002), dxfattribs={'layer': '80 HEADER'})
+
+    path = tmp_path / 'drawing.dxf'
+    doc.saveas(path)
+    return str(path)
+
+
+def record(monkeypatch, *names):
+    #wraps the named autocorrect functions, returns the list their calls are noted in 
+    calls = []
+    for name in names:
+        function = getattr(autocorrect, name)
+        monkeypatch.setattr(autocorrect, name, lambda *args, name=name, function=function, **kwargs: calls.append(name) or function(*args, **kwargs))
+    return calls
+
+
+def tables(session):
+    result = session.result
+    return [result.post_rejected_blocks, result.post_rejected_lines, result.all_fail, result.line_block_connections, result.all_lines_table]
+
+
+def test_cache_hit_skips_every_stage(drawing, monkeypatch):
+    expected = tables(autocorrect.analyse_file(drawing))
+
+    calls = record(monkeypatch, 'autocad_points', 'before_after', 'validate_categories')
+    assert tables(autocorrect.analyse_file(drawing)) == expected
+    assert calls == []
+
+
+def test_catalogue_change_invalidates_the_entry(drawing, monkeypatch):
+    tables(autocorrect.analyse_file(drawing))
+
+    session = Session()
+    session.add(ObjectID(name='TEST BLOCK', type='INSERT', category='STUD', on_channel_outline='Yes'))
+    session.commit()
+    try:
+        calls = record(monkeypatch, 'autocad_points', 'before_after', 'validate_categories')
+        changed = autocorrect.analyse_file(drawing)
+        assert calls == ['autocad_points']
+        tables(changed)
+        assert calls == ['autocad_points', 'before_after', 'validate_categories']
+    finally:
+        session.query(ObjectID).filter_by(name='TEST BLOCK').delete()
+        session.commit()
+        session.close()
@@ -0,0 +1,31 @@
+import pytest
+from backend.datafiltration import datafiltration
+
+
+def duplicates(lines, tolerance):
+    rows = [[name, *ends, False] for name, *ends in lines]
+    refs = [f'ref{i}' for i in range(len(lines))]
+    duplicate_refs, _ = datafiltration.remove_duplicate_lines(rows, refs, tolerance=tolerance)
+    return duplicate_refs
+
+
+def test_exact_duplicates_either_way_round():
+    lines = [['535 TRUSS LINE', 1000, 1000, 1000, 6000], ['535 TRUSS LINE', 1000, 6000, 1000, 1000],
+             ['535 TRUSS LINE', 1000, 1000, 1000, 6000.01], ['80 HEADER', 1000, 1000, 1000, 6000]]
+
+    assert duplicates(lines, 0) == ['ref1']
+
+
+@pytest.mark.parametrize('offset, duplicate', [(0.49, True), (0.5, True), (0.51, False)])
+def test_duplicates_within_tolerance(offset, duplicate):
+    lines = [['535 TRUSS LINE', 1000, 1000, 1000, 6000], ['535 TRUSS LINE', 1000 + offset, 1000, 1000, 6000]]
+
+    assert duplicates(lines, 0.5) == (['ref1'] if duplicate else [])
+
+
+def test_reversed_duplicate_across_cells_within_tolerance():
+    #the copy is reversed and its start sits in the next cell over from the first line's end 
+    lines = [['80 HEADER', 2000, 3000, 4000, 3000.99], ['80 HEADER', 4000, 3001.3, 2000.4, 3000]]
+
+    assert duplicates(lines, 0.5) == ['ref1']
+    assert duplicates(lines, 0.3) == []
@@ -0,0 +1,97 @@
+import os
+import sqlite3
+import pytest
+from sqlalchemy import create_engine
+from database.db_models import migrate, SCHEMA_VERSION
+
+#the schema before revision 1, as created by the baseline ObjectID and CategoryLineRule models 
+BASELINE_SCHEMA = '''
+CREATE TABLE objects (object_id INTEGER NOT NULL, name VARCHAR NOT NULL, type VARCHAR NOT NULL, category VARCHAR, 
+                      on_channel_outline VARCHAR, PRIMARY KEY (object_id));
+CREATE TABLE category_line_rules (id INTEGER NOT NULL, category VARCHAR NOT NULL, allowed_connections VARCHAR, 
+                                  double_connection VARCHAR NOT NULL, PRIMARY KEY (id));
+'''
+
+OBJECTS = [('NLB 30 CENTRE', 'INSERT', 'STUD', 'Yes'), ('CPSHS150X50X8', 'INSERT', 'CP', 'Yes'), 
+           ('80 HEADER', 'LINE', 'HEADER', 'No')]
+RULES = [('HEADER', 'CP,STUD', 'Yes'), ('TRUSS LINE', 'TRUSS LINE,HEADER', 'No')]
+
+
+def baseline_database(path, objects=OBJECTS, rules=RULES):
+    with sqlite3.connect(path) as conn:
+        conn.executescript(BASELINE_SCHEMA)
+        conn.executemany('INSERT INTO objects (name, type, category, on_channel_outline) VALUES (?, ?, ?, ?)', objects)
+        conn.executemany('INSERT INTO category_line_rules (category, allowed_connections, double_connection) VALUES (?, ?, ?)', rules)
+    conn.close()
+    return str(path)
+
+
+def read(path, query):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(query).fetchall()
+    finally:
+        conn.close()
+
+
+def upgrade(path):
+    engine = create_engine(f'sqlite:///{path}')
+    try:
+        migrate(engine)
+    finally:
+        engine.dispose()
+
+
+def test_baseline_database_is_upgraded(tmp_path):
+    path = baseline_database(tmp_path / 'objectdatabase.db')
+    upgrade(path)
+
+    assert read(path, 'PRAGMA user_version') == [(SCHEMA_VERSION,)]
+    assert [row[1] for row in read(path, 'PRAGMA table_info(category_line_rules)')] == ['id', 'category', 'double_connection']
+    assert read(path, 'SELECT r.category, c.connection, r.double_connection FROM category_line_rules r JOIN category_connections c '
+                      'ON c.rule_id = r.id ORDER BY r.id, c.position') == [
+        ('HEADER', 'CP', 'Yes'), ('HEADER', 'STUD', 'Yes'), ('TRUSS LINE', 'TRUSS LINE', 'No'), ('TRUSS LINE', 'HEADER', 'No')]
+    assert read(path, 'SELECT name FROM objects ORDER BY object_id') == [(row[0],) for row in OBJECTS]
+
+    #the backup is the database as it was 
+    backup = path + '.v0.bak'
+    assert read(backup, 'PRAGMA user_version') == [(0,)]
+    assert read(backup, 'SELECT category, allowed_connections FROM category_line_rules') == [row[:2] for row in RULES]
+
+    upgrade(path) #already up to date, nothing changes 
+    assert read(path, 'PRAGMA user_version') == [(SCHEMA_VERSION,)]
+
+
+def test_nested_duplicate_rules_are_merged(tmp_path):
+    rules = RULES + [('HEADER', 'STUD', 'No')]
+    path = baseline_database(tmp_path / 'objectdatabase.db', rules=rules)
+    upgrade(path)
+
+    assert read(path, "SELECT c.connection FROM category_line_rules r JOIN category_connections c ON c.rule_id = r.id "
+                      "WHERE r.category = 'HEADER' ORDER BY c.position") == [('CP',), ('STUD',)]
+    assert read(path, "SELECT double_connection FROM category_line_rules WHERE category = 'HEADER'") == [('Yes',)]
+
+
+def test_identical_duplicate_objects_are_removed(tmp_path):
+    path = baseline_database(tmp_path / 'objectdatabase.db', objects=OBJECTS + [OBJECTS[0]])
+    upgrade(path)
+
+    assert read(path, 'SELECT count(*) FROM objects') == [(len(OBJECTS),)]
+    assert read(path + '.v0.bak', 'SELECT count(*) FROM objects') == [(len(OBJECTS) + 1,)]
+
+
+@pytest.mark.parametrize('objects, rules', [
+    (OBJECTS, RULES + [('HEADER', 'TRUSS LINE,STUD', 'Yes')]), #rules for the same category that allow different connections 
+    (OBJECTS + [('80 HEADER', 'LINE', 'HEADER', 'Yes')], RULES), #a line listed again on the channel outline, name_match_block reads later rows 
+])
+def test_conflicting_duplicates_are_refused(tmp_path, objects, rules):
+    path = baseline_database(tmp_path / 'objectdatabase.db', objects=objects, rules=rules)
+    with open(path, 'rb') as f:
+        before = f.read()
+
+    with pytest.raises(RuntimeError, match='can not be upgraded'):
+        upgrade(path)
+
+    with open(path, 'rb') as f:
+        assert f.read() == before
+    assert not os.path.exists(path + '.v0.bak')
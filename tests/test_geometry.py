@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+from backend.geometry import LineSet, distance, equations, intersect, move_onto, project
+from backend.mathematical import Mathematical
+from backend.autocorrect import TOLERANCE
+
+
+def old_distance(x_start, y_start, x_end, y_end, x, y):
+    #how the distance was worked out from calc_slope before lines were stored as a*x + b*y + c = 0
+    slope, intercept = Mathematical.calc_slope(x_start, y_start, x_end, y_end)
+    return abs(y - (slope * x + intercept))
+
+
+#45 degree 80 HEADER lines with a point TOLERANCE above them, the distance rounds to exactly 1.0 for the first and just over for the second
+AT_TOLERANCE = [
+    ((632.93, 4509.11, 2212.27, 6088.45), (963.16, 4840.34), True),
+    ((817.66, 3622.29, 1382.32, 4186.95), (1215.52, 4021.15), False),
+]
+
+
+@pytest.mark.parametrize('line, point, on_line', AT_TOLERANCE)
+def test_45_degree_line_at_tolerance(line, point, on_line):
+    lines = LineSet.from_segments([['80 HEADER', *line]])
+    x, y = point
+
+    assert lines.distances(x, y)[0] == old_distance(*line, x, y)
+    assert distance(lines.line(0), x, y) == old_distance(*line, x, y)
+    assert Mathematical.find_distance_to_line(x, y, lines.line(0)) == old_distance(*line, x, y)
+    assert (distance(lines.line(0), x, y) <= TOLERANCE) is on_line
+
+
+def test_vertical_line_distance():
+    lines = LineSet.from_segments([['535 TRUSS LINE', 1000.0, 1000.0, 1000.2, 6000.0]])
+
+    assert lines.b[0] == 0
+    assert distance(lines.line(0), 1001.0, 3000.0) == 1.0
+
+
+def solve(*lines):
+    #equations of [x_start, y_start, x_end, y_end] lines as arrays, vertical the same way as LineSet 
+    x_start, y_start, x_end, y_end = np.array(lines, dtype=float).T
+    return equations(x_start, y_start, x_end, y_end, np.abs(x_end - x_start) < 0.3)
+
+
+def test_intersect_crossing_lines():
+    a, b, c = solve([0, 0, 10, 10], [0, 10, 10, 0], [2, 0, 2, 10])
+    x, y, parallel = intersect(a[:2], b[:2], c[:2], a[[1, 2]], b[[1, 2]], c[[1, 2]])
+
+    assert not parallel.any()
+    assert x == pytest.approx([5, 2])
+    assert y == pytest.approx([5, 8])
+
+
+def test_intersect_parallel_and_vertical_lines():
+    a, b, c = solve([0, 0, 10, 10], [0, 5, 10, 15], [3, 0, 3, 10], [7, 0, 7.1, 10])
+    x, y, parallel = intersect(a[[0, 2]], b[[0, 2]], c[[0, 2]], a[[1, 3]], b[[1, 3]], c[[1, 3]])
+
+    assert parallel.tolist() == [True, True]
+    assert np.isnan(x).all() and np.isnan(y).all()
+
+
+def test_intersect_nearly_parallel_lines():
+    #45 degree lines from drawing coordinates, the slopes differ only in the last digit 
+    a, b, c = solve([817.66, 3622.29, 1382.32, 4186.95], [632.93, 4509.11, 2212.27, 6088.45])
+    assert a[0] != a[1]
+
+    _, _, parallel = intersect(a[:1], b[:1], c[:1], a[1:], b[1:], c[1:])
+    assert parallel.tolist() == [True]
+
+
+def test_move_onto():
+    #sloped end onto a vertical line, vertical end across onto a vertical line, parallel ends stay 
+    a, b, c = solve([0, 0, 10, 10], [4, 0, 4, 10], [0, 5, 10, 15])
+    new_x, new_y = move_onto(a[[0, 1, 0]], b[[0, 1, 0]], c[[0, 1, 0]], a[[1, 1, 2]], b[[1, 1, 2]], c[[1, 1, 2]],
+                             np.array([5.0, 3.0, 9.0]), np.array([5.0, 6.0, 9.0]))
+
+    assert new_x == pytest.approx([4, 4, 9])
+    assert new_y == pytest.approx([4, 6, 9])
+
+
+def test_project():
+    lines = LineSet.from_segments([['80 HEADER', 0, 0, 10, 10], ['535 TRUSS LINE', 3, 0, 3, 10]])
+
+    assert project(lines.line(0), 0, 2) == pytest.approx((1, 1))
+    assert project(lines.line(1), 7, 4) == pytest.approx((3, 4))
+
+
+def test_merged_joins_overlapping_segments_and_keeps_walls():
+    lines = LineSet.from_segments([['WALL', 0, 0, 10, 0], ['WALL', 8, 0, 20, 0], ['WALL', 30, 0, 40, 0],
+                                   ['WALL', 20, 0, 30, 0], ['WALL', 0, 5, 10, 5]])
+    merged = lines.merged(keep=[3])
+
+    assert merged.members == [[0, 1], [2], [3], [4]]
+    assert merged.rows[0][4:] == [0, 0, 20, 0]